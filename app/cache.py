@@ -0,0 +1,224 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Generic,
+    Hashable,
+    Sequence,
+    TypeVar,
+)
+from uuid import uuid4
+
+from pydantic import TypeAdapter
+
+from app.config import settings
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+Body = TypeVar('Body', bytes, bytes | None)
+
+
+class TTLCache(Generic[K, V]):
+    """In-process LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, *, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def get(self, key: K) -> V | None:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: K) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self)}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    async def get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Set `key` only if it is absent; return whether it was set."""
+
+    @abstractmethod
+    async def delete(self, keys: Sequence[str]) -> None:
+        ...
+
+
+class LocalCacheBackend(CacheBackend):
+    """Per-process backend, also a stand-in for the shared one in tests."""
+
+    def __init__(self, *, maxsize: int, ttl: float):
+        self._cache: TTLCache[str, bytes] = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        return [self._cache.get(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._cache.set(key, value, ttl)
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        if self._cache.get(key) is not None:
+            return False
+        self._cache.set(key, value, ttl)
+        return True
+
+    async def delete(self, keys: Sequence[str]) -> None:
+        for key in keys:
+            self._cache.delete(key)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Backend shared by all workers; needs the optional `redis` package."""
+
+    def __init__(self, url: str):
+        from redis.asyncio import Redis
+
+        self._redis = Redis.from_url(url)
+
+    async def get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        values = await self._redis.mget(keys)
+        # Bytes unless the URL asks redis to decode responses
+        return [
+            value.encode() if isinstance(value, str) else value
+            for value in values
+        ]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._redis.set(key, value, px=int(ttl * 1000))
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return bool(
+            await self._redis.set(key, value, px=int(ttl * 1000), nx=True)
+        )
+
+    async def delete(self, keys: Sequence[str]) -> None:
+        await self._redis.delete(*keys)
+
+
+class ResponseCache:
+    """Read-through cache of serialized responses.
+
+    Entries depend on resources named like `ResourceVersion` keys. Every
+    resource has a random generation that is part of the entry key;
+    invalidating a resource drops its generation, so entries built from
+    older data become unreachable, even ones stored by a request that
+    read the database before the invalidating commit.
+    """
+
+    def __init__(self, backend: CacheBackend, *, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits: defaultdict[str, int] = defaultdict(int)
+        self.misses: defaultdict[str, int] = defaultdict(int)
+
+    async def _generations(self, resources: Sequence[str]) -> list[bytes]:
+        keys = [f'gen:{resource}' for resource in resources]
+        generations = await self.backend.get_many(keys)
+        for i, generation in enumerate(generations):
+            if generation is None:
+                new = uuid4().hex.encode()
+                await self.backend.add(keys[i], new, self.ttl)
+                # Another worker may have won the race to create it
+                (generations[i],) = await self.backend.get_many([keys[i]])
+        return [generation or b'' for generation in generations]
+
+    async def get_or_load(
+        self,
+        route: str,
+        resources: Sequence[str],
+        load: Callable[[], Awaitable[Body]],
+    ) -> Body:
+        """Return the cached body, or call `load` and cache its result.
+
+        `load` returning None (e.g. not found) is not cached.
+        """
+        generations = await self._generations(resources)
+        key = ':'.join(
+            ['resp', route]
+            + [f'{r}@{g.decode()}' for r, g in zip(resources, generations)]
+        )
+        (cached,) = await self.backend.get_many([key])
+        if cached is not None:
+            self.hits[route] += 1
+            return cached
+        self.misses[route] += 1
+        body = await load()
+        if body is not None:
+            await self.backend.set(key, body, self.ttl)
+        return body
+
+    async def invalidate(self, *resources: str) -> None:
+        await self.backend.delete([f'gen:{r}' for r in resources])
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        stats = {}
+        for route in self.hits.keys() | self.misses.keys():
+            hits, misses = self.hits[route], self.misses[route]
+            stats[route] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': hits / (hits + misses),
+            }
+        return stats
+
+
+@lru_cache
+def _adapter(schema: Any) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def dump_json(schema: Any, obj: Any) -> bytes:
+    """Serialize ORM objects the same way a `response_model` would."""
+    adapter = _adapter(schema)
+    validated = adapter.validate_python(obj, from_attributes=True)
+    return adapter.dump_json(validated)
+
+
+def make_cache_backend(url: str | None) -> CacheBackend:
+    if url:
+        return RedisCacheBackend(url)
+    return LocalCacheBackend(
+        maxsize=settings.cache_size, ttl=settings.cache_ttl
+    )
+
+
+response_cache = ResponseCache(
+    make_cache_backend(settings.cache_url), ttl=settings.cache_ttl
+)
@@ -0,0 +1,71 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import sha1
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.media import etag_matches
+from app.versions import get_versions
+
+
+def not_modified_error(headers: dict[str, str]):
+    return HTTPException(
+        status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+    )
+
+
+def modified_since(last_modified: datetime | None, header: str) -> bool:
+    if last_modified is None:
+        return True
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return True
+    return last_modified.replace(microsecond=0) > since
+
+
+def conditional_get(*keys: str):
+    """Dependency answering 304 when none of the resources changed.
+
+    `keys` name `ResourceVersion` rows and may use path parameters, e.g.
+    `'post:{post_id}'`. Validators are built from their versions and the
+    query string, so a hit costs one primary key lookup.
+    """
+
+    async def dependency(
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(get_db),
+    ) -> None:
+        resource_keys = [key.format(**request.path_params) for key in keys]
+        versions = await get_versions(db, resource_keys)
+        state = ';'.join(f'{v.key}={v.version}' for v in versions)
+        digest = sha1(f'{state}?{request.url.query}'.encode()).hexdigest()
+        etag = f'W/"{digest}"'
+        last_modified = max((v.modified for v in versions), default=None)
+
+        headers = {'etag': etag, 'cache-control': 'no-cache'}
+        if last_modified is not None:
+            headers['last-modified'] = format_datetime(
+                last_modified.astimezone(timezone.utc), usegmt=True
+            )
+
+        if_none_match = request.headers.get('if-none-match')
+        if_modified_since = request.headers.get('if-modified-since')
+        if if_none_match is not None:
+            if if_none_match.strip() == '*':
+                # Only a resource that was ever written has a current
+                # representation; a missing one must still answer 404
+                matches = len(versions) == len(set(resource_keys))
+            else:
+                matches = etag_matches(if_none_match, etag.removeprefix('W/'))
+            if matches:
+                raise not_modified_error(headers)
+        elif if_modified_since is not None:
+            if not modified_since(last_modified, if_modified_since):
+                raise not_modified_error(headers)
+        response.headers.update(headers)
+
+    return dependency
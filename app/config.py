@@ -14,7 +14,44 @@ class Settings(BaseSettings):
     db_host: str
     db_port: int
     db_name: str
+    # Connection pool per worker process, see /api/v1/internal/pool/
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = -1  # Seconds, -1 keeps connections forever
+    db_pool_pre_ping: bool = False
+    db_statement_timeout: int | None = None  # Milliseconds
+    # Streaming replica serving GET requests, with the primary's user,
+    # password and database name
+    db_replica_host: str | None = None
+    db_replica_port: int | None = None  # Defaults to db_port
+    db_replica_max_lag: float = 5  # Seconds behind the primary
+    db_replica_check_interval: float = 1
+    db_replica_check_timeout: float = 1  # Seconds for the lag query
+    # Seconds a client reads from the primary after its own write
+    db_replica_sticky_window: float = 5
     secret: str
+    query_budget: int | None = None
+    # Serve /api/v1/internal/ endpoints with cache and pool statistics
+    internal_api: bool = False
+    # Serve Prometheus metrics at /metrics
+    metrics: bool = False
+    feed_fanout_limit: int = 5000
+    feed_backfill_size: int = 200
+    user_cache_size: int = 1024
+    user_cache_ttl: float = 60
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_queue: int = 16
+    max_image_size: int = 5 * 1024 * 1024
+    image_workers: int = 2
+    bulk_max_items: int = 1000
+    # 'postgres' or 'memory' (in-process index, for tests without Postgres)
+    search_backend: str = 'postgres'
+    # redis://... to share the response cache between workers
+    cache_url: str | None = None
+    cache_size: int = 4096
+    cache_ttl: float = 300
 
 
 settings = Settings()  # type: ignore
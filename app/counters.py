@@ -0,0 +1,121 @@
+"""Repair drift of the denormalized counters.
+
+The counters are updated by `app.crud` in the same transaction as the
+rows they count, so drift only comes from writes made around the API
+(manual SQL, bulk loads). Run periodically, e.g. from cron:
+
+    python -m app.counters
+"""
+import asyncio
+from typing import Any, Callable
+
+from sqlalchemy import BigInteger, any_, func, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+from app.database import SessionLocal
+from app.models import Comment, Follow, Group, Post, User
+from app.versions import bump_versions, commit
+
+
+def post_keys(post_id: int) -> tuple[str, ...]:
+    return 'posts', f'post:{post_id}'
+
+
+def group_keys(group_id: int) -> tuple[str, ...]:
+    return 'groups', f'group:{group_id}'
+
+
+# Counter column, foreign key of the counted rows, versioned resources
+COUNTERS: list[
+    tuple[
+        InstrumentedAttribute[int],
+        InstrumentedAttribute[Any],
+        Callable[[int], tuple[str, ...]] | None,
+    ]
+] = [
+    (Post.comment_count, Comment.post_id, post_keys),
+    (Group.post_count, Post.group_id, group_keys),
+    (User.follower_count, Follow.following_id, None),
+    (User.following_count, Follow.user_id, None),
+]
+
+
+async def repair_counter(
+    db: AsyncSession,
+    counter: InstrumentedAttribute[int],
+    foreign_key: InstrumentedAttribute[Any],
+) -> list[int]:
+    """Set a counter to the actual count where it differs, and return
+    the ids of the repaired rows.
+
+    Rows that differ are locked, in id order like `crud.add_to_counters`
+    does, before they are counted again. Counting under the lock sees
+    the rows of every writer that changed the counter; a count taken
+    before could overwrite an increment committed meanwhile.
+    """
+    model = counter.class_
+    counts = (
+        select(foreign_key.label('id'), func.count().label('n'))
+        .group_by(foreign_key)
+        .subquery()
+    )
+    drifted = (
+        select(model.id)
+        .outerjoin(counts, counts.c.id == model.id)
+        .where(counter != func.coalesce(counts.c.n, 0))
+    )
+    row_ids = list(
+        await db.scalars(
+            select(model.id)
+            .where(model.id.in_(drifted))
+            .order_by(model.id)
+            .with_for_update()
+        )
+    )
+    if not row_ids:
+        return []
+    actual = (
+        select(func.count())
+        .where(foreign_key == model.id)
+        .correlate(model)
+        .scalar_subquery()
+    )
+    repaired = await db.scalars(
+        update(model)
+        .where(
+            model.id == any_(literal(row_ids, ARRAY(BigInteger))),
+            counter != actual,
+        )
+        .values({counter: actual})
+        .returning(model.id)
+        .execution_options(synchronize_session=False)
+    )
+    return list(repaired)
+
+
+async def reconcile_counters(db: AsyncSession) -> dict[str, int]:
+    """Repair every counter in one transaction; returns the number of
+    repaired rows per counter."""
+    repaired = {}
+    for counter, foreign_key, keys in COUNTERS:
+        row_ids = await repair_counter(db, counter, foreign_key)
+        if row_ids and keys is not None:
+            await bump_versions(
+                db, *{key for row_id in row_ids for key in keys(row_id)}
+            )
+        repaired[f'{counter.class_.__name__}.{counter.key}'] = len(row_ids)
+    await commit(db)
+    return repaired
+
+
+async def main() -> None:
+    async with SessionLocal() as db:
+        repaired = await reconcile_counters(db)
+    for counter, count in repaired.items():
+        print(f'{counter}: {count} repaired')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
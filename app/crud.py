@@ -1,12 +1,39 @@
-from typing import Sequence
-
-from fastapi_pagination.ext.sqlalchemy import paginate
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from collections import Counter, defaultdict
+from typing import Collection, Iterator, Mapping, NoReturn, Sequence
+
+from sqlalchemy import (
+    ColumnElement,
+    Row,
+    Select,
+    Subquery,
+    case,
+    delete,
+    func,
+    insert,
+    literal,
+    select,
+    true,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute, joinedload
 
 from app import schemas
-from app.models import Comment, Follow, Group, Post, User
+from app.config import settings
+from app.images import image_processor
+from app.models import Comment, Follow, Group, Post, TimelineEntry, User
+from app.pagination import CursorPage, CursorParams, keyset_window, paginate
+from app.search import search_backend
+from app.storage import (
+    FileTooLarge,
+    InvalidFileType,
+    save_data_uri,
+    storage,
+)
 from app.utils import get_password_hash
+from app.versions import bump_versions, commit
 
 
 class UserExists(Exception):
@@ -17,146 +44,801 @@ class FollowExists(Exception):
     pass
 
 
+class FollowDoesNotExist(Exception):
+    pass
+
+
+class DoesNotExist(Exception):
+    pass
+
+
+class NotAuthor(Exception):
+    pass
+
+
+class UserDoesNotExist(Exception):
+    pass
+
+
+class CantFollowSelf(Exception):
+    pass
+
+
 class GroupDoesNotExist(Exception):
     pass
 
 
-def get_user(db: Session, *, username: str) -> User | None:
-    return db.scalar(select(User).where(User.username == username))
+class ImageDoesNotExist(Exception):
+    pass
+
+
+class InvalidImage(Exception):
+    pass
 
 
-def create_user(db: Session, *, user: schemas.UserCreate) -> User:
-    stmt = select(User).where(
-        (User.username == user.username) | (User.email == user.email)
+async def add_to_counters(
+    db: AsyncSession,
+    row_id_column: InstrumentedAttribute[int],
+    deltas: Mapping[int, Mapping[InstrumentedAttribute[int], int]],
+) -> None:
+    """Atomically change counter columns of a model by row id.
+
+    Each row is updated once, in id order, whichever of its counters
+    change, so that concurrent writers lock the rows in the same order
+    and don't deadlock on them.
+    """
+    for row_id, row_deltas in sorted(deltas.items()):
+        values = {
+            counter: counter + delta
+            for counter, delta in row_deltas.items()
+            if delta
+        }
+        if values:
+            await db.execute(
+                update(row_id_column.class_)
+                .where(row_id_column == row_id)
+                .values(values)
+            )
+
+
+async def add_to_counter(
+    db: AsyncSession,
+    counter: InstrumentedAttribute[int],
+    deltas: Mapping[int, int],
+) -> None:
+    await add_to_counters(
+        db,
+        counter.class_.id,
+        {row_id: {counter: delta} for row_id, delta in deltas.items()},
     )
-    if db.execute(stmt).first():
-        raise UserExists
 
-    hashed_password = get_password_hash(user.password)
-    user_data = user.model_dump() | {'password': hashed_password}
-    db_user = User(**user_data)
 
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+async def add_to_group_post_counts(
+    db: AsyncSession, deltas: Mapping[int | None, int]
+) -> None:
+    """Change post counts of groups; posts without a group are skipped."""
+    group_deltas = {
+        group_id: n for group_id, n in deltas.items() if group_id
+    }
+    if group_deltas:
+        await add_to_counter(db, Group.post_count, group_deltas)
+        await bump_versions(
+            db, 'groups', *(f'group:{group_id}' for group_id in group_deltas)
+        )
+
+
+async def get_user(db: AsyncSession, *, username: str) -> User | None:
+    return await db.scalar(select(User).where(User.username == username))
+
+
+async def create_user(db: AsyncSession, *, user: schemas.UserCreate) -> User:
+    hashed_password = await get_password_hash(user.password)
+    user_data = user.model_dump() | {'password': hashed_password}
+    # Either unique constraint (username or email) skips the insert
+    db_user = await db.scalar(
+        pg_insert(User)
+        .values(**user_data)
+        .on_conflict_do_nothing()
+        .returning(User)
+    )
+    if db_user is None:
+        raise UserExists
+    await db.commit()
     return db_user
 
 
-def get_groups(db: Session) -> Sequence[Group]:
-    return db.scalars(select(Group)).all()
+async def update_password_hash(
+    db: AsyncSession, *, user: User, hashed_password: str
+) -> None:
+    user.password = hashed_password
+    await db.commit()
 
 
-def get_group(db: Session, *, group_id: int) -> Group | None:
-    return db.scalar(select(Group).where(Group.id == group_id))
+async def get_groups(db: AsyncSession) -> Sequence[Group]:
+    return (await db.scalars(select(Group))).all()
 
 
-def get_posts(db: Session) -> Sequence[Post]:
-    return paginate(db, select(Post))
+async def get_group(db: AsyncSession, *, group_id: int) -> Group | None:
+    return await db.scalar(select(Group).where(Group.id == group_id))
 
 
-def get_post(db: Session, *, post_id: int) -> Post | None:
-    return db.scalar(select(Post).where(Post.id == post_id))
+def select_posts() -> Select[tuple[Post]]:
+    return select(Post).options(
+        joinedload(Post.author).load_only(User.username)
+    )
 
 
-def create_post(
-    db: Session, *, data: schemas.PostCreate, author_id: int
-) -> Post:
-    if data.group and not get_group(db, group_id=data.group):
-        raise GroupDoesNotExist
-    db_post = Post(
-        **data.model_dump(exclude={'group'}),
-        group_id=data.group,
-        author_id=author_id,
+def post_row_columns(
+    author: ColumnElement[str] | InstrumentedAttribute[str],
+) -> tuple:
+    """Columns of `schemas.Post`, for plain rows rendered by
+    `app.serializers.post_row`."""
+    return (
+        Post.id,
+        author.label('author'),
+        Post.text,
+        Post.pub_date,
+        Post.image,
+        Post.group_id.label('group'),
+        Post.image_variants,
+        Post.comment_count,
+    )
+
+
+def select_post_rows() -> Select:
+    return select(*post_row_columns(User.username)).join(
+        User, User.id == Post.author_id
+    )
+
+
+async def get_posts(db: AsyncSession, *, params: CursorParams) -> CursorPage:
+    return await paginate(
+        db,
+        select_post_rows(),
+        keys=(Post.pub_date, Post.id),
+        params=params,
+        descending=True,
+        scalars=False,
     )
 
-    db.add(db_post)
-    db.commit()
-    db.refresh(db_post)
-    return db_post
 
+async def get_group_posts(
+    db: AsyncSession, *, group_id: int, params: CursorParams
+) -> CursorPage:
+    """Keyset pages over the (group_id, pub_date, id) index."""
+    return await paginate(
+        db,
+        select_post_rows().where(Post.group_id == group_id),
+        keys=(Post.pub_date, Post.id),
+        params=params,
+        descending=True,
+        count_stmt=select(Group.post_count).where(Group.id == group_id),
+        scalars=False,
+    )
+
+
+async def get_author_posts(
+    db: AsyncSession, *, author_id: int, params: CursorParams
+) -> CursorPage:
+    """Keyset pages over the (author_id, pub_date, id) index."""
+    return await paginate(
+        db,
+        select_post_rows().where(Post.author_id == author_id),
+        keys=(Post.pub_date, Post.id),
+        params=params,
+        descending=True,
+        count_stmt=select(func.count()).where(Post.author_id == author_id),
+        scalars=False,
+    )
+
+
+async def search_posts(
+    db: AsyncSession, *, query: str, params: CursorParams
+) -> CursorPage:
+    return await search_backend.search(
+        db, select_post_rows(), query=query, params=params
+    )
 
-def update_post(
-    db: Session, *, post: Post, data: schemas.PostUpdate | schemas.PostCreate
-) -> Post | None:
-    if data.group and not get_group(db, group_id=data.group):
+
+async def get_post(db: AsyncSession, *, post_id: int) -> Post | None:
+    return await db.scalar(select_posts().where(Post.id == post_id))
+
+
+async def store_image(image: str | None) -> str | None:
+    """Save a legacy base64 data URI, or check that an uploaded file exists.
+
+    Called only after the rest of the request has been validated, so that
+    failed requests do not leave files behind.
+    """
+    if not image:
+        return image
+    if image.startswith('data:image'):
+        try:
+            return await save_data_uri(image)
+        except (ValueError, InvalidFileType, FileTooLarge):
+            raise InvalidImage
+    if not await storage.exists(image):
+        raise ImageDoesNotExist
+    return image
+
+
+async def create_post(
+    db: AsyncSession,
+    *,
+    data: schemas.PostCreate,
+    author_id: int,
+    author_username: str,
+) -> Row:
+    """Create a post and return it as a row shaped like
+    `select_post_rows`, read back from the INSERT's RETURNING."""
+    [result] = await create_posts(
+        db,
+        items=[data],
+        author_id=author_id,
+        author_username=author_username,
+    )
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+async def create_posts(
+    db: AsyncSession,
+    *,
+    items: Sequence[schemas.PostCreate],
+    author_id: int,
+    author_username: str,
+) -> list[Row | Exception]:
+    """Insert a batch of posts with one statement and one transaction.
+
+    Returns a row shaped like `select_post_rows` for every created post,
+    or the exception that `create_post` would raise for it, in order.
+    """
+    group_ids = {item.group for item in items if item.group}
+    existing_groups = set()
+    if group_ids:
+        existing_groups = set(
+            await db.scalars(select(Group.id).where(Group.id.in_(group_ids)))
+        )
+
+    pending: list[Row | Exception | None] = []
+    values = []
+    for item in items:
+        if item.group and item.group not in existing_groups:
+            pending.append(GroupDoesNotExist())
+            continue
+        try:
+            image = await store_image(item.image)
+        except (ImageDoesNotExist, InvalidImage) as e:
+            pending.append(e)
+            continue
+        pending.append(None)  # Filled in from RETURNING
+        values.append(
+            {
+                'text': item.text,
+                'image': image,
+                'image_variants': None,
+                'group_id': item.group,
+                'author_id': author_id,
+            }
+        )
+    rows: Iterator[Row] = iter(())
+    if values:
+        rows = iter(
+            await db.execute(
+                insert(Post).returning(
+                    *post_row_columns(literal(author_username)),
+                    sort_by_parameter_order=True,
+                ),
+                values,
+            )
+        )
+    results = [next(rows) if r is None else r for r in pending]
+    created = [r for r in results if isinstance(r, Row)]
+    if not created:
+        return results
+    await fan_out_posts(db, post_ids=[row.id for row in created])
+    await add_to_group_post_counts(db, Counter(row.group for row in created))
+    await bump_versions(db, 'posts', *(f'post:{row.id}' for row in created))
+    await commit(db)
+    search_backend.add((row.id, row.text) for row in created)
+    await image_processor.enqueue(
+        (row.id, row.image) for row in created if row.image
+    )
+    return results
+
+
+async def update_post(
+    db: AsyncSession,
+    *,
+    post_id: int,
+    author_id: int,
+    author_username: str,
+    data: schemas.PostUpdate | schemas.PostCreate,
+) -> Row:
+    """Update a post of the given author with one UPDATE ... RETURNING.
+
+    Raises `DoesNotExist` or `NotAuthor` when nothing was updated.
+    """
+    if data.group and not await get_group(db, group_id=data.group):
         raise GroupDoesNotExist
 
     update_data = data.model_dump(exclude_unset=True)
     if 'group' in update_data:
         update_data['group_id'] = update_data.pop('group')
-    for field, value in update_data.items():
-        setattr(post, field, value)
+    if 'image' in update_data:
+        image = await store_image(update_data['image'])
+        update_data['image'] = image
+        update_data['image_variants'] = case(
+            (Post.image.is_distinct_from(image), None),
+            else_=Post.image_variants,
+        )
+    if not update_data:
+        # Nothing to change, but authorship is still checked
+        update_data['text'] = Post.text
+    group_changed = 'group_id' in update_data
+    if group_changed:
+        # RETURNING only sees the new group
+        old_group_id = await db.scalar(
+            select(Post.group_id)
+            .where(Post.id == post_id, Post.author_id == author_id)
+            .with_for_update()
+        )
 
-    db.add(post)
-    db.commit()
-    db.refresh(post)
-    return post
+    row = (
+        await db.execute(
+            update(Post)
+            .where(Post.id == post_id, Post.author_id == author_id)
+            .values(**update_data)
+            .returning(*post_row_columns(literal(author_username)))
+        )
+    ).first()
+    if row is None:
+        await raise_not_updated(db, select(Post.id).where(Post.id == post_id))
+    if group_changed and old_group_id != row.group:
+        await add_to_group_post_counts(db, {old_group_id: -1, row.group: 1})
+    await bump_versions(db, 'posts', f'post:{post_id}')
+    await commit(db)
+    search_backend.add([(row.id, row.text)])
+    # Variants are reset only when the image changed; a duplicate job
+    # for an image that is still being processed is harmless
+    if row.image and row.image_variants is None:
+        await image_processor.enqueue([(row.id, row.image)])
+    return row
+
+
+async def delete_post(
+    db: AsyncSession, *, post_id: int, author_id: int
+) -> None:
+    # Comments and timeline entries are removed by ON DELETE CASCADE
+    deleted = (
+        await db.execute(
+            delete(Post)
+            .where(Post.id == post_id, Post.author_id == author_id)
+            .returning(Post.group_id)
+        )
+    ).first()
+    if deleted is None:
+        await raise_not_updated(db, select(Post.id).where(Post.id == post_id))
+    await add_to_group_post_counts(db, {deleted.group_id: -1})
+    await bump_versions(db, 'posts', f'post:{post_id}', f'comments:{post_id}')
+    await commit(db)
+    search_backend.remove(post_id)
+
+
+async def raise_not_updated(db: AsyncSession, exists: Select) -> NoReturn:
+    """Tell apart a missing row from someone else's one after an
+    UPDATE or DELETE filtered by author matched nothing."""
+    if await db.scalar(exists) is None:
+        raise DoesNotExist
+    raise NotAuthor
+
+
+def select_comments() -> Select[tuple[Comment]]:
+    return select(Comment).options(
+        joinedload(Comment.author).load_only(User.username)
+    )
+
+
+def comment_row_columns(
+    author: ColumnElement[str] | InstrumentedAttribute[str],
+) -> tuple:
+    return (
+        Comment.id,
+        author.label('author'),
+        Comment.text,
+        Comment.created,
+        Comment.post_id.label('post'),
+    )
+
+
+def select_comment_rows() -> Select:
+    return select(*comment_row_columns(User.username)).join(
+        User, User.id == Comment.author_id
+    )
 
 
-def delete_post(db: Session, *, post: Post) -> None:
-    db.delete(post)
-    db.commit()
+def count_comments(post_id: int) -> Select[tuple[int]]:
+    return select(func.count()).where(Comment.post_id == post_id)
 
 
-def get_comments(post: Post) -> Sequence[Comment]:
-    return post.comments
+async def get_comments(
+    db: AsyncSession, *, post: Post, params: CursorParams
+) -> CursorPage:
+    return await paginate(
+        db,
+        select_comment_rows().where(Comment.post_id == post.id),
+        keys=(Comment.created, Comment.id),
+        params=params,
+        count_stmt=count_comments(post.id),
+        scalars=False,
+    )
 
 
-def get_comment(db: Session, *, comment_id: int, post: Post) -> Comment | None:
-    return db.scalar(
-        select(Comment).where(
+async def get_comment(
+    db: AsyncSession, *, comment_id: int, post: Post
+) -> Comment | None:
+    return await db.scalar(
+        select_comments().where(
             Comment.id == comment_id, Comment.post_id == post.id
         )
     )
 
 
-def create_comment(
-    db: Session, *, data: schemas.CommentCreate, post: Post, author_id: int
-) -> Comment:
-    db_comment = Comment(
-        **data.model_dump(),
-        post_id=post.id,
+async def create_comment(
+    db: AsyncSession,
+    *,
+    data: schemas.CommentCreate,
+    post: Post,
+    author_id: int,
+    author_username: str,
+) -> Row:
+    [result] = await create_comments(
+        db,
+        items=[data],
+        post=post,
         author_id=author_id,
+        author_username=author_username,
+    )
+    return result
+
+
+async def create_comments(
+    db: AsyncSession,
+    *,
+    items: Sequence[schemas.CommentCreate],
+    post: Post,
+    author_id: int,
+    author_username: str,
+) -> list[Row]:
+    """Insert a batch of comments with one statement, returning rows
+    shaped like `select_comment_rows` in order."""
+    if not items:
+        return []
+    rows = await db.execute(
+        insert(Comment).returning(
+            *comment_row_columns(literal(author_username)),
+            sort_by_parameter_order=True,
+        ),
+        [
+            {'text': item.text, 'post_id': post.id, 'author_id': author_id}
+            for item in items
+        ],
+    )
+    results = list(rows)
+    await add_to_counter(db, Post.comment_count, {post.id: len(results)})
+    await bump_versions(
+        db, 'posts', f'post:{post.id}', f'comments:{post.id}'
     )
+    await commit(db)
+    return results
+
+
+async def update_comment(
+    db: AsyncSession,
+    *,
+    comment_id: int,
+    post_id: int,
+    author_id: int,
+    author_username: str,
+    data: schemas.CommentUpdate,
+) -> Row:
+    row = (
+        await db.execute(
+            update(Comment)
+            .where(
+                Comment.id == comment_id,
+                Comment.post_id == post_id,
+                Comment.author_id == author_id,
+            )
+            .values(text=data.text)
+            .returning(*comment_row_columns(literal(author_username)))
+        )
+    ).first()
+    if row is None:
+        await raise_not_updated(
+            db, select_comment_id(comment_id=comment_id, post_id=post_id)
+        )
+    await bump_versions(db, f'comments:{post_id}')
+    await commit(db)
+    return row
+
+
+async def delete_comment(
+    db: AsyncSession, *, comment_id: int, post_id: int, author_id: int
+) -> None:
+    deleted = await db.scalar(
+        delete(Comment)
+        .where(
+            Comment.id == comment_id,
+            Comment.post_id == post_id,
+            Comment.author_id == author_id,
+        )
+        .returning(Comment.id)
+    )
+    if deleted is None:
+        await raise_not_updated(
+            db, select_comment_id(comment_id=comment_id, post_id=post_id)
+        )
+    await add_to_counter(db, Post.comment_count, {post_id: -1})
+    await bump_versions(db, 'posts', f'post:{post_id}', f'comments:{post_id}')
+    await commit(db)
 
-    db.add(db_comment)
-    db.commit()
-    db.refresh(db_comment)
-    return db_comment
 
+def select_comment_id(*, comment_id: int, post_id: int) -> Select[tuple[int]]:
+    return select(Comment.id).where(
+        Comment.id == comment_id, Comment.post_id == post_id
+    )
 
-def update_comment(
-    db: Session, *, comment: Comment, data: schemas.CommentUpdate
-) -> Comment | None:
-    update_data = data.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(comment, field, value)
 
-    db.add(comment)
-    db.commit()
-    db.refresh(comment)
-    return comment
+async def get_follows(
+    db: AsyncSession, *, user_id: int, params: CursorParams
+) -> CursorPage:
+    """Page of rows with `following` usernames; the follower is always
+    the current user, so their name is not selected."""
+    stmt = (
+        select(Follow.following_id, User.username.label('following'))
+        .join(User, User.id == Follow.following_id)
+        .where(Follow.user_id == user_id)
+    )
+    return await paginate(
+        db, stmt, keys=(Follow.following_id,), params=params, scalars=False
+    )
 
 
-def delete_comment(db: Session, *, comment: Comment) -> None:
-    db.delete(comment)
-    db.commit()
+async def create_follow(
+    db: AsyncSession, *, user_id: int, following_id: int
+) -> None:
+    inserted = await db.scalar(
+        pg_insert(Follow)
+        .values(user_id=user_id, following_id=following_id)
+        .on_conflict_do_nothing()
+        .returning(Follow.following_id)
+    )
+    if inserted is None:
+        raise FollowExists
+    await add_to_follow_counts(db, user_id=user_id, following_ids=[inserted])
+
+    # Usually already in the identity map, loaded by the caller
+    author = await db.get(User, following_id)
+    if author and not author.fanout_on_read:
+        await backfill_timeline(db, user_id=user_id, author_id=following_id)
+        await update_fanout_mode(db, author=author)
+    await db.commit()
+
+
+async def create_follows(
+    db: AsyncSession, *, user_id: int, usernames: Sequence[str]
+) -> list[User | Exception]:
+    """Follow a batch of users with one INSERT and one transaction.
+
+    Returns the followed user, or the reason it was skipped, for every
+    username in order: `UserDoesNotExist`, `CantFollowSelf` or
+    `FollowExists` (also for repeats within the batch).
+    """
+    users = {
+        user.username: user
+        for user in await db.scalars(
+            select(User).where(User.username.in_(set(usernames)))
+        )
+    }
+    following_ids = {
+        user.id for user in users.values() if user.id != user_id
+    }
+    inserted = set()
+    if following_ids:
+        inserted = set(
+            await db.scalars(
+                pg_insert(Follow)
+                .values(
+                    [
+                        {'user_id': user_id, 'following_id': following_id}
+                        for following_id in sorted(following_ids)
+                    ]
+                )
+                .on_conflict_do_nothing()
+                .returning(Follow.following_id)
+            )
+        )
 
+    await add_to_follow_counts(db, user_id=user_id, following_ids=inserted)
+
+    results: list[User | Exception] = []
+    seen = set()
+    for username in usernames:
+        user = users.get(username)
+        if user is None:
+            results.append(UserDoesNotExist())
+        elif user.id == user_id:
+            results.append(CantFollowSelf())
+        elif user.id not in inserted or user.id in seen:
+            results.append(FollowExists())
+        else:
+            results.append(user)
+            seen.add(user.id)
+
+    for user in users.values():
+        if user.id in inserted and not user.fanout_on_read:
+            await backfill_timeline(db, user_id=user_id, author_id=user.id)
+            await update_fanout_mode(db, author=user)
+    await db.commit()
+    return results
+
+
+async def delete_follow(
+    db: AsyncSession, *, user_id: int, following_id: int
+) -> None:
+    result = await db.execute(
+        delete(Follow).where(
+            Follow.user_id == user_id, Follow.following_id == following_id
+        )
+    )
+    if not result.rowcount:
+        raise FollowDoesNotExist
+    await add_to_follow_counts(
+        db, user_id=user_id, following_ids=[following_id], delta=-1
+    )
+    await trim_timeline(db, user_id=user_id, author_id=following_id)
+    await db.commit()
+
+
+async def add_to_follow_counts(
+    db: AsyncSession,
+    *,
+    user_id: int,
+    following_ids: Collection[int],
+    delta: int = 1,
+) -> None:
+    """Change the counters of both sides in one pass over the users: two
+    users following each other at once would otherwise lock their rows
+    in opposite orders."""
+    if not following_ids:
+        return
+    deltas: defaultdict[int, dict] = defaultdict(dict)
+    for following_id in following_ids:
+        deltas[following_id][User.follower_count] = delta
+    deltas[user_id][User.following_count] = delta * len(following_ids)
+    await add_to_counters(db, User.id, deltas)
+
+
+def select_author_post_ids(author_id: int) -> Select[tuple[int]]:
+    return select(Post.id).where(Post.author_id == author_id)
+
+
+async def fan_out_posts(db: AsyncSession, *, post_ids: list[int]) -> None:
+    """Copy new posts into the timelines of their authors' followers."""
+    followers = (
+        select(Follow.user_id, Post.pub_date, Post.id)
+        .join(Post, Post.author_id == Follow.following_id)
+        .join(User, User.id == Follow.following_id)
+        .where(Post.id.in_(post_ids), User.fanout_on_read.is_(False))
+    )
+    await db.execute(
+        insert(TimelineEntry).from_select(
+            ['user_id', 'pub_date', 'post_id'], followers
+        )
+    )
 
-def get_follows(db: Session, *, user_id: int) -> Sequence[Follow]:
-    return db.scalars(select(Follow).where(Follow.user_id == user_id)).all()
 
+async def backfill_timeline(
+    db: AsyncSession, *, user_id: int, author_id: int
+) -> None:
+    """Copy the latest posts of a newly followed author into a timeline."""
+    latest_posts = (
+        select(literal(user_id), Post.pub_date, Post.id)
+        .where(Post.author_id == author_id)
+        .order_by(Post.pub_date.desc(), Post.id.desc())
+        .limit(settings.feed_backfill_size)
+    )
+    await db.execute(
+        pg_insert(TimelineEntry)
+        .from_select(['user_id', 'pub_date', 'post_id'], latest_posts)
+        .on_conflict_do_nothing()
+    )
 
-def create_follow(db: Session, *, user_id: int, following_id: int) -> Follow:
-    stmt = select(Follow).where(
-        Follow.user_id == user_id, Follow.following_id == following_id
+
+async def trim_timeline(
+    db: AsyncSession, *, user_id: int, author_id: int
+) -> None:
+    await db.execute(
+        delete(TimelineEntry).where(
+            TimelineEntry.user_id == user_id,
+            TimelineEntry.post_id.in_(select_author_post_ids(author_id)),
+        )
+    )
+
+
+async def update_fanout_mode(db: AsyncSession, *, author: User) -> None:
+    """Switch an author to merging on read once they have too many followers.
+
+    Their posts are removed from all timelines, so that pushed and pulled
+    posts never overlap.
+    """
+    limit = settings.feed_fanout_limit
+    followers = (
+        select(Follow.user_id)
+        .where(Follow.following_id == author.id)
+        .limit(limit + 1)
+        .subquery()
+    )
+    count = select(func.count()).select_from(followers)
+    if (await db.execute(count)).scalar_one() <= limit:
+        return
+    author.fanout_on_read = True
+    await db.execute(
+        delete(TimelineEntry).where(
+            TimelineEntry.post_id.in_(select_author_post_ids(author.id))
+        )
     )
-    if db.execute(stmt).first():
-        raise FollowExists
 
-    db_follow = Follow(user_id=user_id, following_id=following_id)
 
-    db.add(db_follow)
-    db.commit()
-    db.refresh(db_follow)
-    return db_follow
+def select_feed(user_id: int, params: CursorParams) -> Subquery:
+    """Ids and dates of the posts that can be on a feed page.
+
+    Each source is cut to a page past the cursor before the union, so
+    that only a few rows are merged: the user's timeline range and the
+    latest posts of every followed author merged on read, all read from
+    the (user_id, pub_date, post_id) and (author_id, pub_date, id) indexes.
+    """
+    pushed = keyset_window(
+        select(
+            TimelineEntry.post_id.label('id'), TimelineEntry.pub_date
+        ).where(TimelineEntry.user_id == user_id),
+        keys=(TimelineEntry.pub_date, TimelineEntry.post_id),
+        params=params,
+        descending=True,
+    ).subquery()
+    authors = (
+        select(Follow.following_id)
+        .join(User, User.id == Follow.following_id)
+        .where(Follow.user_id == user_id, User.fanout_on_read.is_(True))
+        .subquery()
+    )
+    latest = keyset_window(
+        select(Post.id, Post.pub_date).where(
+            Post.author_id == authors.c.following_id
+        ),
+        keys=(Post.pub_date, Post.id),
+        params=params,
+        descending=True,
+    ).lateral()
+    pulled = select(latest.c.id, latest.c.pub_date).select_from(
+        authors.join(latest, true())
+    )
+    return union_all(
+        select(pushed.c.id, pushed.c.pub_date), pulled
+    ).subquery('feed')
+
+
+async def get_feed(
+    db: AsyncSession, *, user_id: int, params: CursorParams
+) -> CursorPage:
+    feed = select_feed(user_id, params)
+    return await paginate(
+        db,
+        select_post_rows().join(feed, feed.c.id == Post.id),
+        keys=(feed.c.pub_date, feed.c.id),
+        params=params,
+        descending=True,
+        scalars=False,
+    )
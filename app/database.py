@@ -1,20 +1,248 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import cast
 
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.cache import make_cache_backend
 from app.config import settings
 
-DATABASE_URL = (
-    f'postgresql://{settings.db_user}:{settings.db_pass}'
-    f'@{settings.db_host}:{settings.db_port}/{settings.db_name}'
+logger = logging.getLogger(__name__)
+
+
+def database_url(host: str, port: int) -> str:
+    return (
+        f'postgresql+asyncpg://{settings.db_user}:{settings.db_pass}'
+        f'@{host}:{port}/{settings.db_name}'
+    )
+
+
+DATABASE_URL = database_url(settings.db_host, settings.db_port)
+
+
+@dataclass
+class PoolStats:
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_time: float = 0
+    max_wait_time: float = 0
+
+    def record(self, wait_time: float) -> None:
+        self.checkouts += 1
+        self.wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection
+    (including opening a new one) and how many time out."""
+
+    stats: PoolStats
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return connection
+
+
+def connect_args() -> dict:
+    server_settings = {}
+    if settings.db_statement_timeout is not None:
+        server_settings['statement_timeout'] = str(
+            settings.db_statement_timeout
+        )
+    return {'server_settings': server_settings}
+
+
+def make_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        poolclass=InstrumentedPool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args=connect_args(),
+    )
+
+
+engine = make_engine(DATABASE_URL)
+SessionLocal = async_sessionmaker(
+    bind=engine, autoflush=False, expire_on_commit=False
 )
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class ReplicaMonitor:
+    """Tracks whether the replica answers and how far its replay is
+    behind the primary, rechecking at most once per `interval`. A check
+    that takes longer than `timeout` counts as unreachable."""
+
+    # Zero when everything received is replayed, so that an idle primary
+    # doesn't look like lag; zero as well when not a replica at all
+    LAG_QUERY = text(
+        'SELECT CASE WHEN pg_last_wal_receive_lsn() = '
+        'pg_last_wal_replay_lsn() THEN 0 ELSE coalesce(extract(epoch FROM '
+        'now() - pg_last_xact_replay_timestamp()), 0) END'
+    )
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        *,
+        max_lag: float,
+        interval: float,
+        timeout: float,
+    ):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.interval = interval
+        self.timeout = timeout
+        self.lag: float | None = None  # None while unreachable
+        self._checked_at = float('-inf')
+        self._lock = asyncio.Lock()
+
+    async def usable(self) -> bool:
+        due = time.monotonic() - self._checked_at >= self.interval
+        # Concurrent requests go on with the last result meanwhile
+        if due and not self._lock.locked():
+            async with self._lock:
+                await self.check()
+        return self.lag is not None and self.lag <= self.max_lag
+
+    async def check(self) -> None:
+        self._checked_at = time.monotonic()
+        try:
+            self.lag = await asyncio.wait_for(self._read_lag(), self.timeout)
+        except (asyncio.TimeoutError, SQLAlchemyError, OSError) as e:
+            if self.lag is not None:
+                logger.warning('Replica is unavailable: %r', e)
+            self.lag = None
+        else:
+            if self.lag > self.max_lag:
+                logger.warning('Replica lags by %.1fs', self.lag)
+
+    async def _read_lag(self) -> float:
+        async with self.engine.connect() as conn:
+            return float(await conn.scalar(self.LAG_QUERY))
+
+
+replica_engine: AsyncEngine | None = None
+ReplicaSessionLocal: async_sessionmaker[AsyncSession] | None = None
+replica_monitor: ReplicaMonitor | None = None
+if settings.db_replica_host is not None:
+    replica_engine = make_engine(
+        database_url(
+            settings.db_replica_host,
+            settings.db_replica_port or settings.db_port,
+        )
+    )
+    ReplicaSessionLocal = async_sessionmaker(
+        bind=replica_engine, autoflush=False, expire_on_commit=False
+    )
+    replica_monitor = ReplicaMonitor(
+        replica_engine,
+        max_lag=settings.db_replica_max_lag,
+        interval=settings.db_replica_check_interval,
+        timeout=settings.db_replica_check_timeout,
+    )
+
+# Clients that wrote recently, shared by workers with a shared cache
+recent_writers = make_cache_backend(settings.cache_url)
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+
+def pool_stats(engine: AsyncEngine = engine) -> dict:
+    pool = cast(InstrumentedPool, engine.pool)  # See make_engine
+    stats = pool.stats
+    return {
+        'size': pool.size(),
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': max(pool.overflow(), 0),
+        'max_overflow': settings.db_max_overflow,
+        'checkouts': stats.checkouts,
+        'timeouts': stats.timeouts,
+        'wait_time_total': stats.wait_time,
+        'wait_time_mean': (
+            stats.wait_time / stats.checkouts if stats.checkouts else 0
+        ),
+        'wait_time_max': stats.max_wait_time,
+    }
+
+
+def writer_key(username: str) -> str:
+    return f'writer:{username}'
+
+
+async def read_from_replica(request: Request) -> bool:
+    """Whether a request can be served from the replica.
+
+    Clients are told apart by the user of their access token, which
+    stays the same when they refresh the token. A user that sent a write
+    reads from the primary for the sticky window, so they see their own
+    changes even if the replica hasn't replayed them yet. The window
+    starts before the write, so it must outlast the writing request.
+    """
+    # Imported here, as app.oauth2 needs get_db from this module
+    from app.oauth2 import bearer_username
+
+    if replica_monitor is None:
+        return False
+    username = bearer_username(request.headers.get('authorization'))
+    if request.method not in SAFE_METHODS:
+        if username is not None:
+            await recent_writers.set(
+                writer_key(username),
+                b'1',
+                ttl=settings.db_replica_sticky_window,
+            )
+        return False
+    if username is not None:
+        [wrote] = await recent_writers.get_many([writer_key(username)])
+        if wrote is not None:
+            return False
+    return await replica_monitor.usable()
+
+
+async def get_primary_db():
+    """Session on the primary for any request, for reads that must not
+    be stale: bodies stored in the shared response cache outlive the
+    replica's lag. Connects only if used."""
+    async with SessionLocal() as db:
+        yield db
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db(request: Request):
+    """Session on the replica for reads when possible, else on the
+    primary; a request shares one session between its dependencies."""
+    sessionmaker = SessionLocal
+    if ReplicaSessionLocal is not None and await read_from_replica(request):
+        sessionmaker = ReplicaSessionLocal
+    async with sessionmaker() as db:
         yield db
-    finally:
-        db.close()
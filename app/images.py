@@ -0,0 +1,192 @@
+"""Background generation of resized image variants.
+
+Jobs are stored as files in a queue directory next to the media, so
+they survive restarts and can be shared by several worker processes:
+a job is claimed by atomically moving it into `processing/`. Queue
+files are read and written in worker threads, off the event loop.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable
+from uuid import uuid4
+
+from anyio import to_thread
+from PIL import Image, ImageOps
+from sqlalchemy import update
+
+from app.config import MEDIA_ROOT, settings
+from app.database import SessionLocal
+from app.models import Post
+from app.storage import storage
+from app.versions import bump_versions, commit
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> bounding box (None keeps the original size)
+VARIANTS: dict[str, tuple[int, int] | None] = {
+    'thumb': (160, 160),
+    'medium': (640, 640),
+    'webp': None,
+}
+WEBP_QUALITY = 80
+POLL_INTERVAL = 5
+
+
+def variant_name(image: str, variant: str) -> str:
+    return f'{image.rsplit(".", 1)[0]}.{variant}.webp'
+
+
+def make_variants(image: str) -> dict[str, str]:
+    """Write every variant of a stored image and return their names.
+
+    Source files are content-addressed, so existing variants are reused.
+    """
+    variants = {}
+    with Image.open(storage.path(image)) as source:
+        source = ImageOps.exif_transpose(source)
+        for variant, size in VARIANTS.items():
+            name = variant_name(image, variant)
+            path = storage.path(name)
+            if not path.exists():
+                img = source.copy()
+                if img.mode not in ('RGB', 'RGBA'):
+                    img = img.convert('RGBA')
+                if size is not None:
+                    img.thumbnail(size)
+                tmp_path = path.with_name(f'.{uuid4()}.webp')
+                img.save(tmp_path, 'WEBP', quality=WEBP_QUALITY)
+                os.replace(tmp_path, path)
+            variants[variant] = name
+    return variants
+
+
+class JobQueue:
+    def __init__(self, root: Path):
+        self.root = root
+        self.processing = root / 'processing'
+
+    def put(self, jobs: list[dict]) -> None:
+        self.processing.mkdir(parents=True, exist_ok=True)
+        for job in jobs:
+            # Sortable by creation time, unique across processes
+            name = f'{time.time_ns()}-{uuid4().hex}.json'
+            tmp_path = self.root / f'.{name}'
+            tmp_path.write_text(json.dumps(job))
+            os.replace(tmp_path, self.root / name)
+
+    def claim(self) -> tuple[Path, dict] | None:
+        if not self.root.exists():
+            return None
+        for path in sorted(self.root.glob('[!.]*.json')):
+            claimed = self.processing / f'{os.getpid()}-{path.name}'
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue  # Claimed by another process
+            return claimed, json.loads(claimed.read_text())
+        return None
+
+    def done(self, claimed: Path) -> None:
+        claimed.unlink(missing_ok=True)
+
+    def requeue_orphans(self) -> None:
+        """Return jobs claimed by processes that are no longer running."""
+        if not self.processing.exists():
+            return
+        for path in self.processing.glob('*.json'):
+            pid, _, name = path.name.partition('-')
+            if not pid_alive(int(pid)):
+                os.replace(path, self.root / name)
+
+
+def pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return False  # Left over from a previous run with the same pid
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ImageProcessor:
+    def __init__(self, queue: JobQueue, *, workers: int):
+        self.queue = queue
+        self.workers = workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    async def enqueue(self, images: Iterable[tuple[int, str]]) -> None:
+        """Queue the variants of (post id, image) pairs."""
+        jobs = [
+            {'post_id': post_id, 'image': image} for post_id, image in images
+        ]
+        if jobs:
+            await to_thread.run_sync(self.queue.put, jobs)
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        await to_thread.run_sync(self.queue.requeue_orphans)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix='image-processor'
+        )
+        self._tasks = [
+            asyncio.create_task(self._work()) for _ in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown()
+        # Unfinished jobs stay in processing/ and are requeued on restart
+
+    async def _work(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            claimed = await to_thread.run_sync(self.queue.claim)
+            if claimed is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            path, job = claimed
+            try:
+                variants = await loop.run_in_executor(
+                    self._executor, make_variants, job['image']
+                )
+                await save_variants(job['post_id'], job['image'], variants)
+            except Exception:
+                logger.exception('Failed to process image job %s', job)
+            await to_thread.run_sync(self.queue.done, path)
+
+
+async def save_variants(
+    post_id: int, image: str, variants: dict[str, str]
+) -> None:
+    async with SessionLocal() as db:
+        # The image may have been replaced while the job was queued
+        result = await db.execute(
+            update(Post)
+            .where(Post.id == post_id, Post.image == image)
+            .values(image_variants=variants)
+        )
+        if result.rowcount:
+            await bump_versions(db, 'posts', f'post:{post_id}')
+        await commit(db)
+
+
+image_processor = ImageProcessor(
+    JobQueue(MEDIA_ROOT / '.queue'), workers=settings.image_workers
+)
@@ -0,0 +1,323 @@
+"""Bulk load CSV or NDJSON files into the database with COPY.
+
+Every file is named after its table; tables are loaded in foreign key
+order, all in one transaction, and files are streamed, so memory use
+does not depend on their size:
+
+    python -m app.loader user=users.csv post=posts.ndjson comment=...
+
+The first CSV line, or the keys of the first JSON object, name the
+columns, and every JSON object must have the same keys; omitted columns
+get their defaults, and empty CSV fields and JSON nulls are NULL.
+
+Secondary indexes and foreign keys of the loaded tables are dropped
+before COPY and recreated afterwards, which checks every row once in
+bulk instead of once per row; a violation rolls the whole load back.
+Both take exclusive locks, so load while the API is stopped. Afterwards
+id sequences are moved past the loaded ids, counters are reconciled and
+feed timelines are rebuilt.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import time
+from datetime import datetime
+from itertools import chain
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterator
+
+from sqlalchemy import Table, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+from app.counters import reconcile_counters
+from app.database import SessionLocal, engine
+from app.models import Base, Comment, Follow, Group, Post, User
+
+# In foreign key order
+TABLES: list[Table] = [
+    Base.metadata.tables[model.__tablename__]
+    for model in (User, Group, Post, Comment, Follow)
+]
+FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+
+class LoaderError(Exception):
+    pass
+
+
+def parse_bool(value: str | bool) -> bool:
+    if isinstance(value, bool):
+        return value
+    if value.lower() in ('t', 'true', '1', 'yes'):
+        return True
+    if value.lower() in ('f', 'false', '0', 'no'):
+        return False
+    raise ValueError(f'not a boolean: {value!r}')
+
+
+def converter(table: Table, name: str) -> Callable[[Any], Any]:
+    """Convert a CSV string or a JSON value to what asyncpg's binary
+    COPY expects for the column."""
+    column = table.columns.get(name)
+    if column is None or column.computed is not None:
+        raise LoaderError(f'{table.name} has no writable column {name!r}')
+    python_type = column.type.python_type
+    if python_type is bool:
+        return parse_bool
+    if python_type is datetime:
+        return datetime.fromisoformat
+    if python_type is dict:
+        return lambda value: (
+            value if isinstance(value, str) else json.dumps(value)
+        )
+    return python_type
+
+
+def ndjson_row(line: str, columns: list[str]) -> list[Any]:
+    """Values of a JSON object in column order. A missing key can't be
+    told apart from NULL within one COPY, so it is an error."""
+    record = json.loads(line)
+    if not isinstance(record, dict) or record.keys() != set(columns):
+        raise ValueError(f'expected an object with keys {columns}')
+    return [record[column] for column in columns]
+
+
+async def read_records(
+    path: Path, table: Table
+) -> tuple[list[str], AsyncIterator[tuple]]:
+    """Column names of a file and an iterator over its converted rows."""
+    fmt = FORMATS.get(path.suffix)
+    if fmt is None:
+        raise LoaderError(f'{path}: expected one of {", ".join(FORMATS)}')
+    f = path.open(newline='' if fmt == 'csv' else None, encoding='utf-8')
+    lines: Iterator
+    parse: Callable[[Any], list[Any]]
+    if fmt == 'csv':
+        lines = csv.reader(f)
+        columns = next(lines, [])
+        first_line = 2
+
+        def parse(row: list[str]) -> list[Any]:
+            if len(row) != len(columns):
+                raise ValueError(
+                    f'expected {len(columns)} fields, got {len(row)}'
+                )
+            return [value if value != '' else None for value in row]
+
+    else:
+        first = f.readline()
+        try:
+            columns = list(json.loads(first)) if first.strip() else []
+        except (TypeError, ValueError) as e:
+            f.close()
+            raise LoaderError(f'{path}:1: {e}') from e
+        lines = chain([first], f)
+        first_line = 1
+
+        def parse(line: str) -> list[Any]:
+            return ndjson_row(line, columns)
+
+    if not columns:
+        f.close()
+        raise LoaderError(f'{path}: no columns')
+    converters = [converter(table, column) for column in columns]
+
+    async def records() -> AsyncIterator[tuple]:
+        with f:
+            for line, raw in enumerate(lines, start=first_line):
+                if fmt == 'ndjson' and not raw.strip():
+                    continue
+                try:
+                    yield tuple(
+                        value if value is None else convert(value)
+                        for convert, value in zip(converters, parse(raw))
+                    )
+                except (TypeError, ValueError) as e:
+                    raise LoaderError(f'{path}:{line}: {e}') from e
+
+    return columns, records()
+
+
+async def drop_secondary_objects(
+    conn: AsyncConnection, table: str
+) -> list[str]:
+    """Drop foreign keys and indexes not backing a constraint, and
+    return the statements recreating them."""
+    restore = []
+    foreign_keys = await conn.execute(
+        text(
+            'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+            "WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'"
+        ),
+        {'table': f'"{table}"'},
+    )
+    for name, definition in foreign_keys:
+        await conn.execute(
+            text(f'ALTER TABLE "{table}" DROP CONSTRAINT "{name}"')
+        )
+        restore.append(
+            f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}'
+        )
+    indexes = await conn.execute(
+        text(
+            'SELECT c.relname, pg_get_indexdef(i.indexrelid) '
+            'FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+            'WHERE i.indrelid = CAST(:table AS regclass) '
+            'AND NOT i.indisunique AND NOT EXISTS ('
+            'SELECT 1 FROM pg_constraint WHERE conindid = i.indexrelid)'
+        ),
+        {'table': f'"{table}"'},
+    )
+    for name, definition in indexes:
+        await conn.execute(text(f'DROP INDEX "{name}"'))
+        restore.insert(0, definition)  # Indexes before foreign keys
+    return restore
+
+
+async def resync_sequence(conn: AsyncConnection, table: Table) -> None:
+    """Make ids generated after the load follow the loaded ones."""
+    if 'id' not in table.columns:
+        return
+    await conn.execute(
+        text(
+            'SELECT setval(pg_get_serial_sequence(:table, :column), '
+            f'coalesce(max(id), 1), max(id) IS NOT NULL) FROM "{table.name}"'
+        ),
+        {'table': f'"{table.name}"', 'column': 'id'},
+    )
+
+
+async def rebuild_timelines(conn: AsyncConnection) -> None:
+    """Switch fan-out modes and push posts to timelines, as the app does
+    for follows and posts created through the API."""
+    await conn.execute(
+        text(
+            'UPDATE "user" SET fanout_on_read = true '
+            'WHERE NOT fanout_on_read AND follower_count > :limit'
+        ),
+        {'limit': settings.feed_fanout_limit},
+    )
+    await conn.execute(
+        text(
+            'DELETE FROM timeline USING post, "user" '
+            'WHERE post.id = timeline.post_id '
+            'AND "user".id = post.author_id AND "user".fanout_on_read'
+        )
+    )
+    await conn.execute(
+        text(
+            'INSERT INTO timeline (user_id, pub_date, post_id) '
+            'SELECT follow.user_id, latest.pub_date, latest.id FROM follow '
+            'JOIN "user" ON "user".id = follow.following_id '
+            'CROSS JOIN LATERAL (SELECT post.id, post.pub_date FROM post '
+            'WHERE post.author_id = follow.following_id '
+            'ORDER BY post.pub_date DESC, post.id DESC LIMIT :size) latest '
+            'WHERE NOT "user".fanout_on_read ON CONFLICT DO NOTHING'
+        ),
+        {'size': settings.feed_backfill_size},
+    )
+
+
+async def bump_all_versions(conn: AsyncConnection) -> None:
+    """Change the validators of every resource, including loaded ones
+    that had no version yet, so that no ETag issued before the load
+    still matches. Cached bodies expire with the cache TTL."""
+    await conn.execute(
+        text(
+            'INSERT INTO resource_version (key) '
+            "SELECT 'posts' UNION ALL SELECT 'groups' "
+            "UNION ALL SELECT 'post:' || id FROM post "
+            "UNION ALL SELECT 'comments:' || id FROM post "
+            "UNION ALL SELECT 'group:' || id FROM \"group\" "
+            'ON CONFLICT (key) DO UPDATE SET '
+            'version = resource_version.version + 1, modified = now()'
+        )
+    )
+
+
+async def disable_statement_timeout(conn: AsyncConnection) -> None:
+    # The app's db_statement_timeout would cancel long COPYs and rebuilds
+    await conn.execute(text('SET LOCAL statement_timeout = 0'))
+
+
+async def load(files: dict[str, Path], *, defer: bool) -> None:
+    tables = [table for table in TABLES if table.name in files]
+    total_rows = 0
+    total_start = time.perf_counter()
+    async with engine.begin() as conn:
+        await disable_statement_timeout(conn)
+        raw = (await conn.get_raw_connection()).driver_connection
+        assert raw is not None  # asyncpg's connection, checked out
+        restore = []
+        if defer:
+            for table in tables:
+                restore += await drop_secondary_objects(conn, table.name)
+
+        for table in tables:
+            start = time.perf_counter()
+            columns, records = await read_records(files[table.name], table)
+            result = await raw.copy_records_to_table(
+                table.name, records=records, columns=columns
+            )
+            rows = int(result.split()[-1])  # 'COPY <rows>'
+            total_rows += rows
+            elapsed = time.perf_counter() - start
+            print(
+                f'{table.name}: {rows} rows in {elapsed:.1f}s, '
+                f'{rows / elapsed:.0f} rows/s'
+            )
+            await resync_sequence(conn, table)
+
+        start = time.perf_counter()
+        for statement in restore:
+            await conn.execute(text(statement))
+        if restore:
+            print(
+                f'indexes and foreign keys restored '
+                f'in {time.perf_counter() - start:.1f}s'
+            )
+
+    async with SessionLocal() as db:
+        await disable_statement_timeout(await db.connection())
+        await reconcile_counters(db)
+    async with engine.begin() as conn:
+        await disable_statement_timeout(conn)
+        if files.keys() & {'post', 'follow'}:
+            await rebuild_timelines(conn)
+        await bump_all_versions(conn)
+    elapsed = time.perf_counter() - total_start
+    print(
+        f'total: {total_rows} rows in {elapsed:.1f}s, '
+        f'{total_rows / elapsed:.0f} rows/s'
+    )
+
+
+def parse_file(arg: str) -> tuple[str, Path]:
+    table, sep, path = arg.partition('=')
+    if not sep or table not in {table.name for table in TABLES}:
+        raise argparse.ArgumentTypeError(
+            f'expected <table>=<path> with one of: '
+            f'{", ".join(table.name for table in TABLES)}'
+        )
+    return table, Path(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='+', type=parse_file)
+    parser.add_argument(
+        '--keep-indexes',
+        action='store_true',
+        help="don't drop indexes and foreign keys while loading",
+    )
+    args = parser.parse_args()
+    try:
+        asyncio.run(load(dict(args.files), defer=not args.keep_indexes))
+    except LoaderError as e:
+        parser.exit(1, f'error: {e}\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,49 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from fastapi_pagination import add_pagination
 
-from app import models
-from app.database import engine
-from app.routers import auth, comment, follow, group, post, user
+from app.config import settings
+from app.database import engine, replica_engine
+from app.images import image_processor
+from app.metrics import setup_metrics
+from app.query_counter import QueryBudgetMiddleware
+from app.routers import (
+    auth,
+    comment,
+    feed,
+    follow,
+    group,
+    image,
+    internal,
+    media,
+    post,
+    user,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await image_processor.start()
+    yield
+    await image_processor.stop()
+    await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
 
-models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
-add_pagination(app)
+app = FastAPI(lifespan=lifespan)
+if settings.query_budget is not None:
+    app.add_middleware(QueryBudgetMiddleware, budget=settings.query_budget)
 
 API_PREFIX = '/api/v1'
 
-for router in (auth, comment, follow, group, post, user):
+for router in (auth, comment, feed, follow, group, image, post, user):
     app.include_router(router.router, prefix=API_PREFIX)
+app.include_router(media.router)
+if settings.internal_api:
+    app.include_router(internal.router, prefix=API_PREFIX)
+if settings.metrics:
+    setup_metrics(app, *filter(None, (engine, replica_engine)))
 
 
 # TODO: correct documentation response for 401 (like in user.py) and 422/400
-# TODO: tests
@@ -0,0 +1,154 @@
+import os
+from email.utils import formatdate
+from pathlib import PurePath
+
+from anyio import open_file
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+# One year: stored file names never get new content
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# The only types served inline: images that browsers never execute
+INLINE_TYPES = {
+    '.jpeg': 'image/jpeg',
+    '.jpg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+}
+CHUNK_SIZE = 256 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Parse a `Range` header into an inclusive (first, last) byte range.
+
+    Returns None when the whole file should be sent: multiple ranges are
+    not supported, and a server may ignore any Range header it can't serve.
+    """
+    unit, _, ranges = header.partition('=')
+    if unit.strip() != 'bytes' or ',' in ranges:
+        return None
+    first, sep, last = ranges.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if not first:  # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def etag_matches(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    tags = (tag.strip().removeprefix('W/') for tag in header.split(','))
+    return etag in tags
+
+
+def media_headers(path: str | os.PathLike) -> dict[str, str]:
+    """Content headers that never let a browser run a stored file.
+
+    Files of other types (e.g. legacy uploads stored under the type the
+    client claimed) are only offered as downloads.
+    """
+    content_type = INLINE_TYPES.get(PurePath(path).suffix.lower())
+    if content_type is not None:
+        headers = {'content-type': content_type}
+    else:
+        headers = {
+            'content-type': 'application/octet-stream',
+            'content-disposition': 'attachment',
+        }
+    headers['x-content-type-options'] = 'nosniff'
+    return headers
+
+
+class MediaFileResponse(Response):
+    """Send a file or a byte range of it.
+
+    Uses the ASGI zero-copy send extension (sendfile) when the server
+    supports it, and falls back to reading the file in chunks.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        *,
+        size: int,
+        mtime: float,
+        etag: str,
+        byte_range: tuple[int, int] | None = None,
+        send_body: bool = True,
+    ):
+        self.path = path
+        self.send_body = send_body
+        self.status_code = 200
+        self.offset, self.count = 0, size
+        headers = {
+            'etag': etag,
+            'last-modified': formatdate(mtime, usegmt=True),
+            'cache-control': CACHE_CONTROL,
+            'accept-ranges': 'bytes',
+            **media_headers(path),
+        }
+        if byte_range is not None:
+            first, last = byte_range
+            self.status_code = 206
+            self.offset, self.count = first, last - first + 1
+            headers['content-range'] = f'bytes {first}-{last}/{size}'
+        headers['content-length'] = str(self.count)
+        self.init_headers(headers)
+        self.background = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await send(
+            {
+                'type': 'http.response.start',
+                'status': self.status_code,
+                'headers': self.raw_headers,
+            }
+        )
+        if not self.send_body or not self.count:
+            await send({'type': 'http.response.body', 'body': b''})
+        elif 'http.response.zerocopysend' in scope.get('extensions', {}):
+            with open(self.path, 'rb') as f:
+                await send(
+                    {
+                        'type': 'http.response.zerocopysend',
+                        'file': f,
+                        'offset': self.offset,
+                        'count': self.count,
+                    }
+                )
+        else:
+            async with await open_file(self.path, 'rb') as f:
+                await f.seek(self.offset)
+                remaining = self.count
+                while remaining:
+                    chunk = await f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break  # Truncated under us, nothing more to send
+                    remaining -= len(chunk)
+                    await send(
+                        {
+                            'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': bool(remaining),
+                        }
+                    )
+                if remaining:
+                    await send({'type': 'http.response.body', 'body': b''})
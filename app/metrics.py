@@ -0,0 +1,203 @@
+"""Prometheus metrics: request latency per route and DB time per statement.
+
+Enabled with `settings.metrics`. Each worker process keeps its own
+registry; run Prometheus against every worker, or set
+PROMETHEUS_MULTIPROC_DIR as described in the prometheus_client docs.
+"""
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterator
+
+from fastapi import APIRouter, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import (
+    CounterMetricFamily,
+    GaugeMetricFamily,
+    Metric,
+)
+from prometheus_client.registry import Collector
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.database import pool_stats, replica_monitor
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Time to send the whole response',
+    ['method', 'route'],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'Requests being served', ['method', 'route']
+)
+RESPONSES = Counter(
+    'http_responses_total', 'Responses sent', ['method', 'route', 'status']
+)
+DB_STATEMENT_DURATION = Histogram(
+    'db_statement_duration_seconds',
+    'Time to execute a statement, by route and normalized statement',
+    ['route', 'statement'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1),
+)
+DB_STATEMENTS_PER_REQUEST = Histogram(
+    'db_statements_per_request',
+    'Statements sent while serving a request',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50),
+)
+
+# Runs of placeholders from IN lists and multi-row VALUES
+PARAM = r'\$\d+(?:::[A-Z][A-Z ]*(?:\(\d+\))?(?:\[\])?)?'
+PLACEHOLDERS_RE = re.compile(rf'{PARAM}(?:, {PARAM})+')
+VALUES_RE = re.compile(r'(VALUES \([^()]*\))(?:, \([^()]*\))+')
+SPACES_RE = re.compile(r'\s+')
+
+
+@dataclass
+class RequestMetrics:
+    route: str
+    statements: int = 0
+
+
+_current_request: ContextVar[RequestMetrics | None] = ContextVar(
+    'request_metrics', default=None
+)
+
+
+@lru_cache(maxsize=1024)
+def normalize_statement(statement: str) -> str:
+    """Make statements that differ only in the number of parameters
+    (bulk inserts, IN lists) share a label."""
+    statement = SPACES_RE.sub(' ', statement).strip()
+    statement = VALUES_RE.sub(r'\1, ...', statement)
+    return PLACEHOLDERS_RE.sub('...', statement)
+
+
+def route_path(scope: Scope) -> str:
+    """Path template of the route that will handle the request."""
+    for route in scope['app'].routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return 'unmatched'
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        method = scope['method']
+        route = route_path(scope)
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        request = RequestMetrics(route=route)
+        token = _current_request.set(request)
+        in_flight = REQUESTS_IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_DURATION.labels(method, route).observe(
+                time.perf_counter() - start
+            )
+            in_flight.dec()
+            _current_request.reset(token)
+            RESPONSES.labels(method, route, str(status)).inc()
+            DB_STATEMENTS_PER_REQUEST.labels(route).observe(
+                request.statements
+            )
+
+
+# Kept on the execution context rather than the connection, so that a
+# statement that fails leaves nothing behind for the next one
+def _before_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    context.metrics_statement_start = time.perf_counter()
+
+
+def _after_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    elapsed = time.perf_counter() - context.metrics_statement_start
+    request = _current_request.get()
+    if request is not None:
+        request.statements += 1
+    route = request.route if request is not None else 'background'
+    DB_STATEMENT_DURATION.labels(
+        route, normalize_statement(statement)
+    ).observe(elapsed)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    event.listen(
+        engine.sync_engine, 'before_cursor_execute', _before_cursor_execute
+    )
+    event.listen(
+        engine.sync_engine, 'after_cursor_execute', _after_cursor_execute
+    )
+
+
+class PoolCollector(Collector):
+    """Connection pool gauges, read when metrics are scraped."""
+
+    def collect(self) -> Iterator[Metric]:
+        stats = pool_stats()
+        for name in ('size', 'checked_in', 'checked_out', 'overflow'):
+            yield GaugeMetricFamily(f'db_pool_{name}', '', value=stats[name])
+        yield CounterMetricFamily(
+            'db_pool_checkout_timeouts',
+            'Checkouts that timed out',
+            value=stats['timeouts'],
+        )
+        yield CounterMetricFamily(
+            'db_pool_checkout_wait_seconds',
+            'Time spent waiting for a connection',
+            value=stats['wait_time_total'],
+        )
+        if replica_monitor is not None:
+            lag = replica_monitor.lag
+            yield GaugeMetricFamily(
+                'db_replica_lag_seconds',
+                'Replay lag of the replica, NaN while it is unreachable',
+                value=float('nan') if lag is None else lag,
+            )
+
+
+router = APIRouter(include_in_schema=False)
+
+
+@router.get('/metrics')
+def read_metrics():
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+def setup_metrics(app, *engines: AsyncEngine) -> None:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(router)
+    for engine in engines:
+        instrument_engine(engine)
+    REGISTRY.register(PoolCollector())
@@ -1,10 +1,24 @@
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey, String
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Computed,
+    DateTime,
+    ForeignKey,
+    Index,
+    String,
+    text,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.sql import expression, func
 
 
+# Text search configuration of Post.search_vector
+SEARCH_CONFIG = 'russian'
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -16,6 +30,14 @@ class User(Base):
     email: Mapped[str] = mapped_column(unique=True)
     password: Mapped[str]
     is_active: Mapped[bool] = mapped_column(server_default=expression.true())
+    # Posts of authors with too many followers are merged into feeds on
+    # read instead of being copied into every follower's timeline
+    fanout_on_read: Mapped[bool] = mapped_column(
+        server_default=expression.false()
+    )
+    # Counters are kept up to date by app.crud and repaired by app.counters
+    follower_count: Mapped[int] = mapped_column(server_default=text('0'))
+    following_count: Mapped[int] = mapped_column(server_default=text('0'))
 
     posts: Mapped[list['Post']] = relationship(back_populates='author')
     comments: Mapped[list['Comment']] = relationship(back_populates='author')
@@ -39,6 +61,7 @@ class Group(Base):
     title: Mapped[str] = mapped_column(String(200))
     slug: Mapped[str] = mapped_column(String(50), unique=True)
     description: Mapped[str]
+    post_count: Mapped[int] = mapped_column(server_default=text('0'))
 
     posts: Mapped[list['Post']] = relationship(back_populates='group')
 
@@ -51,6 +74,14 @@ class Group(Base):
 
 class Post(Base):
     __tablename__ = 'post'
+    __table_args__ = (
+        Index('post_pub_date_id_idx', 'pub_date', 'id'),
+        Index('post_author_id_pub_date_id_idx', 'author_id', 'pub_date', 'id'),
+        Index('post_group_id_pub_date_id_idx', 'group_id', 'pub_date', 'id'),
+        Index(
+            'post_search_vector_idx', 'search_vector', postgresql_using='gin'
+        ),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     text: Mapped[str]
     pub_date: Mapped[datetime] = mapped_column(
@@ -64,21 +95,40 @@ class Post(Base):
         ForeignKey('group.id', ondelete='SET NULL')
     )
     image: Mapped[str | None] = mapped_column(String(100))
+    # Variant name -> file name, filled in by app.images in the background
+    image_variants: Mapped[dict[str, str] | None] = mapped_column(JSON)
+    # Inside the class body `text` is the column above, not sqlalchemy's
+    comment_count: Mapped[int] = mapped_column(
+        server_default=expression.text('0')
+    )
+    # Generated by Postgres from `text` for full-text search
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{SEARCH_CONFIG}', text)", persisted=True),
+        deferred=True,
+    )
 
     author: Mapped['User'] = relationship(back_populates='posts')
     group: Mapped['Group'] = relationship(back_populates='posts')
-    comments: Mapped[list['Comment']] = relationship(back_populates='post')
+    comments: Mapped[list['Comment']] = relationship(
+        back_populates='post', passive_deletes=True
+    )
 
     def __repr__(self) -> str:
         return (
             f'Post(id={self.id!r}, text={self.text!r}, '
             f'pub_date={self.pub_date!r}, author_id={self.author_id!r}, '
-            f'group_id={self.group_id!r}, image={self.image!r})'
+            f'group_id={self.group_id!r}, image={self.image!r}, '
+            f'image_variants={self.image_variants!r})'
         )
 
 
 class Comment(Base):
     __tablename__ = 'comment'
+    __table_args__ = (
+        Index('comment_post_id_created_id_idx', 'post_id', 'created', 'id'),
+        Index('comment_author_id_idx', 'author_id'),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     author_id: Mapped[int] = mapped_column(
         ForeignKey('user.id', ondelete='CASCADE')
@@ -105,6 +155,7 @@ class Comment(Base):
 
 class Follow(Base):
     __tablename__ = 'follow'
+    __table_args__ = (Index('follow_following_id_idx', 'following_id'),)
     user_id: Mapped[int] = mapped_column(
         ForeignKey('user.id', ondelete='CASCADE'),
         primary_key=True,
@@ -128,3 +179,50 @@ class Follow(Base):
             f'Follow(user_id={self.user_id!r}, '
             f'following_id={self.following_id!r})'
         )
+
+
+class TimelineEntry(Base):
+    __tablename__ = 'timeline'
+    __table_args__ = (Index('timeline_post_id_idx', 'post_id'),)
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey('user.id', ondelete='CASCADE'),
+        primary_key=True,
+    )
+    pub_date: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        primary_key=True,
+    )
+    post_id: Mapped[int] = mapped_column(
+        ForeignKey('post.id', ondelete='CASCADE'),
+        primary_key=True,
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f'TimelineEntry(user_id={self.user_id!r}, '
+            f'pub_date={self.pub_date!r}, post_id={self.post_id!r})'
+        )
+
+
+class ResourceVersion(Base):
+    """Version counter of a cached API resource, e.g. `posts` or `post:1`.
+
+    Bumped by every write that changes the resource and used to build
+    ETag / Last-Modified validators without running the read query.
+    """
+
+    __tablename__ = 'resource_version'
+    key: Mapped[str] = mapped_column(String(100), primary_key=True)
+    version: Mapped[int] = mapped_column(
+        BigInteger, server_default=text('1')
+    )
+    modified: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f'ResourceVersion(key={self.key!r}, version={self.version!r}, '
+            f'modified={self.modified!r})'
+        )
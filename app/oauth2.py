@@ -4,9 +4,12 @@ from typing import Annotated
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
 
-from app import crud, schemas
+from app import crud, models, schemas
+from app.cache import TTLCache
 from app.config import settings
 from app.database import get_db
 
@@ -17,6 +20,40 @@ REFRESH_TOKEN_EXPIRE_MINUTES = 60 * 24
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='api/v1/jwt/create')
 
+user_cache: TTLCache[str, schemas.UserInDB] = TTLCache(
+    maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl
+)
+
+
+CHANGED_USERNAMES = 'changed_usernames'
+
+
+@event.listens_for(models.User, 'after_update')
+@event.listens_for(models.User, 'after_delete')
+def collect_changed_user(mapper, connection, target: models.User) -> None:
+    # Evict under the old username too if it was just changed
+    history = inspect(target).attrs.username.history
+    usernames = {*history.deleted, target.username}
+    session = object_session(target)
+    if session is None:
+        for username in usernames:
+            user_cache.delete(username)
+    else:
+        session.info.setdefault(CHANGED_USERNAMES, set()).update(usernames)
+
+
+# Evicting at the flush would let a concurrent request cache the old row
+# again before the commit, for the whole TTL
+@event.listens_for(Session, 'after_commit')
+def invalidate_cached_users(session: Session) -> None:
+    for username in session.info.pop(CHANGED_USERNAMES, ()):
+        user_cache.delete(username)
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_changed_users(session: Session) -> None:
+    session.info.pop(CHANGED_USERNAMES, None)
+
 
 def create_jwt_token(data: dict, expires_delta: timedelta) -> str:
     expire = datetime.utcnow() + expires_delta
@@ -60,14 +97,29 @@ def verify_jwt_token(
     return token_data
 
 
+def bearer_username(authorization: str | None) -> str | None:
+    """User of a valid `Authorization: Bearer` header, else None."""
+    scheme, _, token = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    try:
+        return verify_jwt_token(token).username
+    except HTTPException:
+        return None
+
+
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     token_data = verify_jwt_token(token)
-    user = crud.get_user(db, username=token_data.username)
+    user = user_cache.get(token_data.username)
     if user is None:
-        raise CREDENTIALS_EXCEPTION
+        db_user = await crud.get_user(db, username=token_data.username)
+        if db_user is None:
+            raise CREDENTIALS_EXCEPTION
+        user = schemas.UserInDB.model_validate(db_user, from_attributes=True)
+        user_cache.set(token_data.username, user)
     return user
 
 
@@ -0,0 +1,149 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from dataclasses import dataclass
+from typing import Annotated, Any, Generic, Sequence, TypeVar
+
+from fastapi import Query
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from sqlalchemy import ColumnElement, Select, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+from app.utils import validation_error
+
+T = TypeVar('T')
+Key = InstrumentedAttribute | ColumnElement
+
+_values_adapter = TypeAdapter(list)
+
+INVALID_CURSOR_ERROR = validation_error({'cursor': ['Неверный курсор.']})
+
+
+class CursorPage(BaseModel, Generic[T]):
+    items: list[T]
+    total: int | None = None
+    next: str | None = None
+    previous: str | None = None
+
+
+@dataclass
+class CursorParams:
+    cursor: str | None = None
+    size: int = 10
+    include_total: bool = False
+
+
+def cursor_params(
+    cursor: Annotated[str | None, Query()] = None,
+    size: Annotated[int, Query(ge=1, le=500)] = 10,
+    include_total: Annotated[bool, Query()] = False,
+) -> CursorParams:
+    return CursorParams(
+        cursor=cursor, size=size, include_total=include_total
+    )
+
+
+def encode_cursor(values: Sequence[Any], *, backwards: bool) -> str:
+    data = {'v': _values_adapter.dump_python(list(values), mode='json')}
+    if backwards:
+        data['b'] = True
+    return urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+def decode_cursor(
+    cursor: str, keys: Sequence[Key]
+) -> tuple[list[Any], bool]:
+    try:
+        data = json.loads(urlsafe_b64decode(cursor.encode()))
+        raw_values = data['v']
+        if len(raw_values) != len(keys):
+            raise ValueError
+        values = [
+            TypeAdapter(key.type.python_type).validate_python(value)
+            for key, value in zip(keys, raw_values)
+        ]
+    except (ValueError, TypeError, KeyError, ValidationError):
+        raise INVALID_CURSOR_ERROR
+    return values, bool(data.get('b'))
+
+
+def keyset_window(
+    stmt: Select,
+    *,
+    keys: Sequence[Key],
+    params: CursorParams,
+    descending: bool = False,
+) -> Select:
+    """Restrict `stmt` to the rows a page may hold: past the cursor, in
+    key order, one more than the page size.
+
+    `paginate` applies it to its statement; applying it to the branches
+    of a union as well lets each branch stop after a page worth of rows
+    instead of the union being sorted as a whole.
+    """
+    backwards = False
+    if params.cursor is not None:
+        values, backwards = decode_cursor(params.cursor, keys)
+        # Walking backwards is walking forwards in the reversed order
+        after_last = descending == backwards
+        row, bound = tuple_(*keys), tuple_(*values)
+        stmt = stmt.where(row > bound if after_last else row < bound)
+    reverse = descending != backwards
+    stmt = stmt.order_by(*(key.desc() if reverse else key for key in keys))
+    return stmt.limit(params.size + 1)
+
+
+async def paginate(
+    db: AsyncSession,
+    stmt: Select,
+    *,
+    keys: Sequence[Key],
+    params: CursorParams,
+    descending: bool = False,
+    count_stmt: Select[tuple[int]] | None = None,
+    scalars: bool = True,
+) -> CursorPage:
+    """Keyset pagination of `stmt` ordered by `keys`.
+
+    `keys` must be unique as a whole (end with the primary key) and all
+    share the same direction, so that a single row-value comparison can
+    use a composite index on them. `count_stmt` replaces the generic
+    COUNT over `stmt` when a cheaper one is available. With
+    `scalars=False` the page holds plain rows, for statements selecting
+    columns rather than an ORM entity; keys are then read by column label.
+    """
+    total = None
+    if params.include_total:
+        if count_stmt is None:
+            count_stmt = select(func.count()).select_from(
+                stmt.order_by(None).subquery()
+            )
+        total = await db.scalar(count_stmt)
+
+    backwards = False
+    if params.cursor is not None:
+        _, backwards = decode_cursor(params.cursor, keys)
+    result = await db.execute(
+        keyset_window(stmt, keys=keys, params=params, descending=descending)
+    )
+    rows = list(result.scalars().all() if scalars else result.all())
+    has_more = len(rows) > params.size
+    rows = rows[: params.size]
+    if backwards:
+        rows.reverse()
+
+    def key_values(item) -> list[Any]:
+        # Keys are attributes or labeled columns, so they have names
+        return [getattr(item, str(key.key)) for key in keys]
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = encode_cursor(key_values(rows[-1]), backwards=False)
+        if (has_more and backwards) or (params.cursor and not backwards):
+            previous_cursor = encode_cursor(
+                key_values(rows[0]), backwards=True
+            )
+    return CursorPage(
+        items=rows, total=total, next=next_cursor, previous=previous_cursor
+    )
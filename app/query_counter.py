@@ -0,0 +1,90 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from fastapi import Request
+from sqlalchemy import event
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.database import engine, replica_engine
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+@dataclass
+class QueryCounter:
+    budget: int | None = None
+    statements: list[str] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def exceeded(self) -> bool:
+        return self.budget is not None and self.count > self.budget
+
+
+_current_counter: ContextVar[QueryCounter | None] = ContextVar(
+    'query_counter', default=None
+)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.statements.append(statement)
+
+
+for _engine in filter(None, (engine, replica_engine)):
+    event.listen(_engine.sync_engine, 'before_cursor_execute', _count_query)
+
+
+@contextmanager
+def count_queries(budget: int | None = None) -> Iterator[QueryCounter]:
+    """Count SQL statements sent while the block runs.
+
+    Raises `QueryBudgetExceeded` on exit if more than `budget` were sent,
+    which makes it usable as an assertion in tests.
+    """
+    counter = QueryCounter(budget=budget)
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+    if counter.exceeded:
+        raise QueryBudgetExceeded(
+            f'{counter.count} queries sent, budget is {budget}:\n'
+            + '\n'.join(counter.statements)
+        )
+
+
+class QueryBudgetMiddleware(BaseHTTPMiddleware):
+    """Log a warning for requests that send more than `budget` queries."""
+
+    def __init__(self, app, budget: int):
+        super().__init__(app)
+        self.budget = budget
+
+    async def dispatch(self, request: Request, call_next):
+        counter = QueryCounter(budget=self.budget)
+        token = _current_counter.set(counter)
+        try:
+            return await call_next(request)
+        finally:
+            _current_counter.reset(token)
+            if counter.exceeded:
+                logger.warning(
+                    '%s %s sent %d queries (budget %d)',
+                    request.method,
+                    request.url.path,
+                    counter.count,
+                    self.budget,
+                )
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, oauth2, schemas, utils
 from app.database import get_db
@@ -7,21 +7,29 @@ from app.database import get_db
 router = APIRouter(tags=['Authentication'], prefix='/jwt')
 
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = crud.get_user(db, username=username)
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await crud.get_user(db, username=username)
     if not user:
         return False
-    if not utils.verify_password(password, user.password):
+    is_valid, new_hash = await utils.verify_password(password, user.password)
+    if not is_valid:
         return False
+    if new_hash:
+        await crud.update_password_hash(
+            db, user=user, hashed_password=new_hash
+        )
     return user
 
 
 @router.post('/create/', response_model=schemas.Tokens)
 async def login_for_jwt_tokens(
     token_data: schemas.TokenCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    user = authenticate_user(db, **token_data.model_dump())
+    try:
+        user = await authenticate_user(db, **token_data.model_dump())
+    except utils.PasswordHasherBusy:
+        raise utils.service_unavailable_error('Server is busy, try again')
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
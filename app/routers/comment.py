@@ -1,12 +1,21 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Response, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, models, schemas
+from app.conditional import conditional_get
+from app.config import settings
 from app.database import get_db
 from app.oauth2 import get_current_active_user
+from app.pagination import CursorPage, CursorParams, cursor_params
 from app.routers.post import get_post
+from app.serializers import (
+    bulk_response,
+    comment_row,
+    page_response,
+    row_response,
+)
 from app.utils import not_author_error, not_found_error
 
 router = APIRouter(tags=['Comment'], prefix='/posts/{post_id}/comments')
@@ -15,19 +24,27 @@ router = APIRouter(tags=['Comment'], prefix='/posts/{post_id}/comments')
 async def get_comment(
     comment_id: int,
     post: Annotated[models.Post, Depends(get_post)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    comment = crud.get_comment(db, comment_id=comment_id, post=post)
+    comment = await crud.get_comment(db, comment_id=comment_id, post=post)
     if not comment:
         raise not_found_error('Страница не найдена.')
     return comment
 
 
-@router.get('/', response_model=list[schemas.Comment])
+@router.get(
+    '/',
+    response_model=CursorPage[schemas.Comment],
+    dependencies=[Depends(conditional_get('comments:{post_id}'))],
+)
 async def read_comments(
     post: Annotated[models.Post, Depends(get_post)],
+    params: Annotated[CursorParams, Depends(cursor_params)],
+    response: Response,
+    db: AsyncSession = Depends(get_db),
 ):
-    return crud.get_comments(post=post)
+    page = await crud.get_comments(db, post=post, params=params)
+    return page_response(page, comment_row, response)
 
 
 @router.get('/{comment_id}', response_model=schemas.Comment)
@@ -44,39 +61,86 @@ async def create_comment(
     current_user: Annotated[
         schemas.UserInDB, Depends(get_current_active_user)
     ],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    return crud.create_comment(
-        db, data=data, post=post, author_id=current_user.id
+    comment = await crud.create_comment(
+        db,
+        data=data,
+        post=post,
+        author_id=current_user.id,
+        author_username=current_user.username,
     )
+    return row_response(comment, comment_row)
+
+
+@router.post(
+    '/bulk/', response_model=list[schemas.BulkResult[schemas.Comment]]
+)
+async def create_comments(
+    items: Annotated[
+        list[schemas.CommentCreate], Body(max_length=settings.bulk_max_items)
+    ],
+    post: Annotated[models.Post, Depends(get_post)],
+    current_user: Annotated[
+        schemas.UserInDB, Depends(get_current_active_user)
+    ],
+    db: AsyncSession = Depends(get_db),
+):
+    results = await crud.create_comments(
+        db,
+        items=items,
+        post=post,
+        author_id=current_user.id,
+        author_username=current_user.username,
+    )
+    return bulk_response(results, comment_row, {})
 
 
 @router.patch('/{comment_id}', response_model=schemas.Comment)
 @router.put('/{comment_id}', response_model=schemas.Comment)
-async def update_post(
+async def update_comment(
+    post_id: int,
+    comment_id: int,
     data: schemas.CommentUpdate,
-    comment: Annotated[models.Comment, Depends(get_comment)],
-    post: Annotated[models.Post, Depends(get_post)],
     current_user: Annotated[
         schemas.UserInDB, Depends(get_current_active_user)
     ],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    if current_user != comment.author:
+    try:
+        comment = await crud.update_comment(
+            db,
+            comment_id=comment_id,
+            post_id=post_id,
+            author_id=current_user.id,
+            author_username=current_user.username,
+            data=data,
+        )
+    except crud.DoesNotExist:
+        raise not_found_error('Страница не найдена.')
+    except crud.NotAuthor:
         raise not_author_error('Изменение чужого контента запрещено.')
-    return crud.update_comment(db, comment=comment, data=data)
+    return row_response(comment, comment_row)
 
 
 @router.delete('/{comment_id}', status_code=status.HTTP_204_NO_CONTENT)
 async def delete_comment(
-    comment: Annotated[models.Comment, Depends(get_comment)],
-    post: Annotated[models.Post, Depends(get_post)],
+    post_id: int,
+    comment_id: int,
     current_user: Annotated[
         schemas.UserInDB, Depends(get_current_active_user)
     ],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    if current_user != comment.author:
+    try:
+        await crud.delete_comment(
+            db,
+            comment_id=comment_id,
+            post_id=post_id,
+            author_id=current_user.id,
+        )
+    except crud.DoesNotExist:
+        raise not_found_error('Страница не найдена.')
+    except crud.NotAuthor:
         raise not_author_error('Изменение чужого контента запрещено.')
-    crud.delete_comment(db, comment=comment)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
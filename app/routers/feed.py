@@ -0,0 +1,24 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, schemas
+from app.database import get_db
+from app.oauth2 import get_current_active_user
+from app.pagination import CursorPage, CursorParams, cursor_params
+from app.serializers import page_response, post_row
+
+router = APIRouter(tags=['Feed'], prefix='/feed')
+
+
+@router.get('/', response_model=CursorPage[schemas.Post])
+async def read_feed(
+    current_user: Annotated[
+        schemas.UserInDB, Depends(get_current_active_user)
+    ],
+    params: Annotated[CursorParams, Depends(cursor_params)],
+    db: AsyncSession = Depends(get_db),
+):
+    page = await crud.get_feed(db, user_id=current_user.id, params=params)
+    return page_response(page, post_row)
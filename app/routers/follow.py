@@ -1,12 +1,15 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, schemas
+from app.config import settings
 from app.database import get_db
 from app.oauth2 import get_current_active_user
-from app.utils import validation_error
+from app.pagination import CursorPage, CursorParams, cursor_params
+from app.serializers import bulk_response, follow_row, page_response
+from app.utils import not_found_error, validation_error
 
 router = APIRouter(tags=['Follow'], prefix='/follow')
 
@@ -21,14 +24,16 @@ FOLLOW_EXISTS_ERROR = validation_error(
 )
 
 
-@router.get('/', response_model=list[schemas.Follow])
+@router.get('/', response_model=CursorPage[schemas.Follow])
 async def read_follows(
     current_user: Annotated[
         schemas.UserInDB, Depends(get_current_active_user)
     ],
-    db: Session = Depends(get_db),
+    params: Annotated[CursorParams, Depends(cursor_params)],
+    db: AsyncSession = Depends(get_db),
 ):
-    return crud.get_follows(db, user_id=current_user.id)
+    page = await crud.get_follows(db, user_id=current_user.id, params=params)
+    return page_response(page, follow_row(current_user.username))
 
 
 @router.post('/', response_model=schemas.Follow)
@@ -37,17 +42,68 @@ async def create_follow(
     current_user: Annotated[
         schemas.UserInDB, Depends(get_current_active_user)
     ],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    following_user = crud.get_user(db, username=data.following)
+    following_user = await crud.get_user(db, username=data.following)
     if not following_user:
         raise FOLLOW_NOT_FOUND_ERROR
-    if current_user == following_user:
+    if current_user.id == following_user.id:
         raise CANT_FOLLOW_SELF_ERROR
     try:
-        follow = crud.create_follow(
+        await crud.create_follow(
             db, user_id=current_user.id, following_id=following_user.id
         )
     except crud.FollowExists:
         raise FOLLOW_EXISTS_ERROR
-    return follow
+    return schemas.Follow(
+        user=current_user.username, following=following_user.username
+    )
+
+
+@router.post('/bulk/', response_model=list[schemas.BulkResult[schemas.Follow]])
+async def create_follows(
+    items: Annotated[
+        list[schemas.FollowCreate], Body(max_length=settings.bulk_max_items)
+    ],
+    current_user: Annotated[
+        schemas.UserInDB, Depends(get_current_active_user)
+    ],
+    db: AsyncSession = Depends(get_db),
+):
+    results = await crud.create_follows(
+        db,
+        user_id=current_user.id,
+        usernames=[item.following for item in items],
+    )
+    return bulk_response(
+        results,
+        lambda user: {
+            'user': current_user.username,
+            'following': user.username,
+        },
+        {
+            crud.UserDoesNotExist: FOLLOW_NOT_FOUND_ERROR.detail,
+            crud.CantFollowSelf: CANT_FOLLOW_SELF_ERROR.detail,
+            crud.FollowExists: FOLLOW_EXISTS_ERROR.detail,
+        },
+    )
+
+
+@router.delete('/{username}', status_code=status.HTTP_204_NO_CONTENT)
+async def delete_follow(
+    username: str,
+    current_user: Annotated[
+        schemas.UserInDB, Depends(get_current_active_user)
+    ],
+    db: AsyncSession = Depends(get_db),
+):
+    following_user = await crud.get_user(db, username=username)
+    if not following_user:
+        raise not_found_error('Страница не найдена.')
+    try:
+        await crud.delete_follow(
+            db, user_id=current_user.id, following_id=following_user.id
+        )
+    except crud.FollowDoesNotExist:
+        raise not_found_error('Страница не найдена.')
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,26 +1,69 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, schemas
-from app.database import get_db
+from app.cache import dump_json, response_cache
+from app.conditional import conditional_get
+from app.database import get_db, get_primary_db
+from app.pagination import CursorPage, CursorParams, cursor_params
+from app.serializers import json_response, page_response, post_row
 from app.utils import not_found_error
 
 router = APIRouter(tags=['Group'], prefix='/groups')
 
 
-@router.get('/', response_model=list[schemas.Group])
+@router.get(
+    '/',
+    response_model=list[schemas.Group],
+    dependencies=[Depends(conditional_get('groups'))],
+)
 async def read_groups(
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_primary_db),
 ):
-    return crud.get_groups(db)
+    async def load() -> bytes:
+        return dump_json(list[schemas.Group], await crud.get_groups(db))
+
+    body = await response_cache.get_or_load('read_groups', ['groups'], load)
+    return json_response(body, response)
 
 
-@router.get('/{group_id}', response_model=schemas.Group)
+@router.get(
+    '/{group_id}',
+    response_model=schemas.Group,
+    dependencies=[Depends(conditional_get('group:{group_id}'))],
+)
 async def read_group(
     group_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_primary_db),
+):
+    async def load() -> bytes | None:
+        group = await crud.get_group(db, group_id=group_id)
+        return dump_json(schemas.Group, group) if group else None
+
+    body = await response_cache.get_or_load(
+        'read_group', [f'group:{group_id}'], load
+    )
+    if body is None:
+        raise not_found_error('Страница не найдена.')
+    return json_response(body, response)
+
+
+@router.get(
+    '/{group_id}/posts/',
+    response_model=CursorPage[schemas.Post],
+    dependencies=[Depends(conditional_get('posts'))],
+)
+async def read_group_posts(
+    group_id: int,
+    params: Annotated[CursorParams, Depends(cursor_params)],
+    response: Response,
+    db: AsyncSession = Depends(get_db),
 ):
-    group = crud.get_group(db, group_id=group_id)
-    if not group:
+    if not await crud.get_group(db, group_id=group_id):
         raise not_found_error('Страница не найдена.')
-    return group
+    page = await crud.get_group_posts(db, group_id=group_id, params=params)
+    return page_response(page, post_row, response)
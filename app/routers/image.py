@@ -0,0 +1,64 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Header, Request, status
+
+from app import schemas
+from app.config import settings
+from app.oauth2 import get_current_active_user
+from app.storage import (
+    FileTooLarge,
+    InvalidFileType,
+    check_image_type,
+    image_extension,
+    storage,
+)
+from app.utils import too_large_error, validation_error
+
+router = APIRouter(tags=['Image'], prefix='/images')
+
+INVALID_FILE_TYPE_ERROR = validation_error(
+    'Image must be a JPEG, PNG, GIF or WebP file'
+)
+FILE_TOO_LARGE_ERROR = too_large_error(
+    f'Image must not exceed {settings.max_image_size} bytes'
+)
+
+
+@router.post(
+    '/',
+    response_model=schemas.Image,
+    responses={
+        400: {'description': 'Not an image', 'model': schemas.ErrorMessage},
+        413: {'description': 'Image too large', 'model': schemas.ErrorMessage},
+    },
+    status_code=status.HTTP_201_CREATED,
+)
+async def upload_image(
+    request: Request,
+    content_type: Annotated[str, Header()],
+    current_user: Annotated[
+        schemas.UserInDB, Depends(get_current_active_user)
+    ],
+    content_length: Annotated[int | None, Header()] = None,
+):
+    """Upload the raw image bytes as the request body.
+
+    The returned name can be used as `image` when creating a post.
+    """
+    try:
+        check_image_type(content_type)
+    except InvalidFileType:
+        raise INVALID_FILE_TYPE_ERROR
+    if content_length is not None and content_length > settings.max_image_size:
+        raise FILE_TOO_LARGE_ERROR
+    try:
+        name = await storage.save(
+            request.stream(),
+            detect_ext=image_extension,
+            max_size=settings.max_image_size,
+        )
+    except FileTooLarge:
+        raise FILE_TOO_LARGE_ERROR
+    except InvalidFileType:
+        raise INVALID_FILE_TYPE_ERROR
+    return {'image': name}
@@ -0,0 +1,35 @@
+from fastapi import APIRouter
+
+from app.cache import response_cache
+from app.database import pool_stats, replica_monitor
+from app.oauth2 import user_cache
+
+router = APIRouter(
+    tags=['Internal'], prefix='/internal', include_in_schema=False
+)
+
+
+@router.get('/cache/')
+async def read_cache_stats():
+    return {
+        'responses': response_cache.stats(),
+        'users': user_cache.stats(),
+    }
+
+
+@router.get('/pool/')
+async def read_pool_stats():
+    """Connection pool of the worker process serving the request."""
+    return pool_stats()
+
+
+@router.get('/replica/')
+async def read_replica_status():
+    if replica_monitor is None:
+        return {'configured': False}
+    return {
+        'configured': True,
+        'usable': await replica_monitor.usable(),
+        'lag': replica_monitor.lag,
+        'pool': pool_stats(replica_monitor.engine),
+    }
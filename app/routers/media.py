@@ -0,0 +1,64 @@
+import os
+import re
+import stat
+
+from anyio import to_thread
+from fastapi import APIRouter, Request, Response, status
+
+from app.config import MEDIA_URL
+from app.media import (
+    CACHE_CONTROL,
+    MediaFileResponse,
+    RangeNotSatisfiable,
+    etag_matches,
+    parse_range,
+)
+from app.storage import storage
+from app.utils import not_found_error
+
+router = APIRouter(tags=['Media'], prefix=MEDIA_URL.rstrip('/'))
+
+# Flat names only; dot files (temporary uploads, the job queue) are hidden
+MEDIA_NAME_RE = re.compile(r'[\w-][\w.-]*')
+
+
+@router.api_route('/{name}', methods=['GET', 'HEAD'], include_in_schema=False)
+async def read_media(name: str, request: Request):
+    if not MEDIA_NAME_RE.fullmatch(name):
+        raise not_found_error('Страница не найдена.')
+    path = storage.path(name)
+    try:
+        stat_result = await to_thread.run_sync(os.stat, path)
+    except FileNotFoundError:
+        raise not_found_error('Страница не найдена.')
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise not_found_error('Страница не найдена.')
+
+    # Stored names are content hashes (or random for legacy uploads) and
+    # are never overwritten with other content, so they make strong ETags
+    etag = f'"{name}"'
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={'etag': etag, 'cache-control': CACHE_CONTROL},
+        )
+
+    byte_range = None
+    range_header = request.headers.get('range')
+    if_range = request.headers.get('if-range')
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, stat_result.st_size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={'content-range': f'bytes */{stat_result.st_size}'},
+            )
+    return MediaFileResponse(
+        path,
+        size=stat_result.st_size,
+        mtime=stat_result.st_mtime,
+        etag=etag,
+        byte_range=byte_range,
+        send_body=request.method != 'HEAD',
+    )
@@ -1,33 +1,88 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Response, status
-from sqlalchemy.orm import Session
-
-from app import crud, models, schemas
-from app.database import get_db
+from fastapi import APIRouter, Body, Depends, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, schemas
+from app.cache import dump_json, response_cache
+from app.conditional import conditional_get
+from app.config import settings
+from app.database import get_db, get_primary_db
 from app.oauth2 import get_current_active_user
-from app.utils import Page, not_author_error, not_found_error
+from app.pagination import CursorPage, CursorParams, cursor_params
+from app.serializers import (
+    bulk_response,
+    json_response,
+    page_response,
+    post_row,
+    row_response,
+)
+from app.utils import not_author_error, not_found_error, validation_error
 
 router = APIRouter(tags=['Post'], prefix='/posts')
 
+IMAGE_NOT_FOUND_ERROR = validation_error({'image': ['Файл не найден.']})
+INVALID_IMAGE_ERROR = validation_error(
+    {'image': ['Ошибка при сохранении файла.']}
+)
+
 
-async def get_post(post_id: int, db: Session = Depends(get_db)):
-    post = crud.get_post(db, post_id=post_id)
+async def get_post(post_id: int, db: AsyncSession = Depends(get_db)):
+    post = await crud.get_post(db, post_id=post_id)
     if not post:
         raise not_found_error('Страница не найдена.')
     return post
 
 
-@router.get('/', response_model=Page[schemas.Post])  # type: ignore
+@router.get(
+    '/',
+    response_model=CursorPage[schemas.Post],
+    dependencies=[Depends(conditional_get('posts'))],
+)
 async def read_posts(
-    db: Session = Depends(get_db),
+    params: Annotated[CursorParams, Depends(cursor_params)],
+    response: Response,
+    db: AsyncSession = Depends(get_db),
 ):
-    return crud.get_posts(db)
-
-
-@router.get('/{post_id}', response_model=schemas.Post)
-async def read_post(post: Annotated[models.Post, Depends(get_post)]):
-    return post
+    page = await crud.get_posts(db, params=params)
+    return page_response(page, post_row, response)
+
+
+@router.get(
+    '/search',
+    response_model=CursorPage[schemas.Post],
+    dependencies=[Depends(conditional_get('posts'))],
+)
+async def search_posts(
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    params: Annotated[CursorParams, Depends(cursor_params)],
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+):
+    page = await crud.search_posts(db, query=q, params=params)
+    return page_response(page, post_row, response)
+
+
+@router.get(
+    '/{post_id}',
+    response_model=schemas.Post,
+    dependencies=[Depends(conditional_get('post:{post_id}'))],
+)
+async def read_post(
+    post_id: int,
+    response: Response,
+    db: AsyncSession = Depends(get_primary_db),
+):
+    async def load() -> bytes | None:
+        post = await crud.get_post(db, post_id=post_id)
+        return dump_json(schemas.Post, post) if post else None
+
+    body = await response_cache.get_or_load(
+        'read_post', [f'post:{post_id}'], load
+    )
+    if body is None:
+        raise not_found_error('Страница не найдена.')
+    return json_response(body, response)
 
 
 @router.post('/', response_model=schemas.Post)
@@ -36,57 +91,112 @@ async def create_post(
     current_user: Annotated[
         schemas.UserInDB, Depends(get_current_active_user)
     ],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     try:
-        return crud.create_post(db, data=data, author_id=current_user.id)
+        post = await crud.create_post(
+            db,
+            data=data,
+            author_id=current_user.id,
+            author_username=current_user.username,
+        )
     except crud.GroupDoesNotExist:
         raise not_found_error('Страница не найдена.')
+    except crud.ImageDoesNotExist:
+        raise IMAGE_NOT_FOUND_ERROR
+    except crud.InvalidImage:
+        raise INVALID_IMAGE_ERROR
+    return row_response(post, post_row)
+
+
+@router.post('/bulk/', response_model=list[schemas.BulkResult[schemas.Post]])
+async def create_posts(
+    items: Annotated[
+        list[schemas.PostCreate], Body(max_length=settings.bulk_max_items)
+    ],
+    current_user: Annotated[
+        schemas.UserInDB, Depends(get_current_active_user)
+    ],
+    db: AsyncSession = Depends(get_db),
+):
+    results = await crud.create_posts(
+        db,
+        items=items,
+        author_id=current_user.id,
+        author_username=current_user.username,
+    )
+    return bulk_response(
+        results,
+        post_row,
+        {
+            crud.GroupDoesNotExist: 'Страница не найдена.',
+            crud.ImageDoesNotExist: IMAGE_NOT_FOUND_ERROR.detail,
+            crud.InvalidImage: INVALID_IMAGE_ERROR.detail,
+        },
+    )
 
 
 @router.patch('/{post_id}', response_model=schemas.Post)
 async def partial_update_post(
+    post_id: int,
     data: schemas.PostUpdate,
-    post: Annotated[models.Post, Depends(get_post)],
     current_user: Annotated[
         schemas.UserInDB, Depends(get_current_active_user)
     ],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    if current_user != post.author:
-        raise not_author_error('Изменение чужого контента запрещено.')
-    try:
-        return crud.update_post(db, post=post, data=data)
-    except crud.GroupDoesNotExist:
-        raise not_found_error('Страница не найдена.')
+    return await update_post_row(db, post_id, data, current_user)
 
 
 @router.put('/{post_id}', response_model=schemas.Post)
 async def update_post(
+    post_id: int,
     data: schemas.PostCreate,
-    post: Annotated[models.Post, Depends(get_post)],
     current_user: Annotated[
         schemas.UserInDB, Depends(get_current_active_user)
     ],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    if current_user != post.author:
-        raise not_author_error('Изменение чужого контента запрещено.')
+    return await update_post_row(db, post_id, data, current_user)
+
+
+async def update_post_row(
+    db: AsyncSession,
+    post_id: int,
+    data: schemas.PostUpdate | schemas.PostCreate,
+    current_user: schemas.UserInDB,
+) -> Response:
     try:
-        return crud.update_post(db, post=post, data=data)
-    except crud.GroupDoesNotExist:
+        post = await crud.update_post(
+            db,
+            post_id=post_id,
+            author_id=current_user.id,
+            author_username=current_user.username,
+            data=data,
+        )
+    except (crud.DoesNotExist, crud.GroupDoesNotExist):
         raise not_found_error('Страница не найдена.')
+    except crud.NotAuthor:
+        raise not_author_error('Изменение чужого контента запрещено.')
+    except crud.ImageDoesNotExist:
+        raise IMAGE_NOT_FOUND_ERROR
+    except crud.InvalidImage:
+        raise INVALID_IMAGE_ERROR
+    return row_response(post, post_row)
 
 
 @router.delete('/{post_id}', status_code=status.HTTP_204_NO_CONTENT)
 async def delete_post(
-    post: Annotated[models.Post, Depends(get_post)],
+    post_id: int,
     current_user: Annotated[
         schemas.UserInDB, Depends(get_current_active_user)
     ],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    if current_user != post.author:
+    try:
+        await crud.delete_post(db, post_id=post_id, author_id=current_user.id)
+    except crud.DoesNotExist:
+        raise not_found_error('Страница не найдена.')
+    except crud.NotAuthor:
         raise not_author_error('Изменение чужого контента запрещено.')
-    crud.delete_post(db, post=post)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
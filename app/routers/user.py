@@ -1,12 +1,20 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, schemas
+from app.conditional import conditional_get
 from app.database import get_db
 from app.oauth2 import get_current_active_user
-from app.utils import validation_error
+from app.pagination import CursorPage, CursorParams, cursor_params
+from app.serializers import page_response, post_row
+from app.utils import (
+    PasswordHasherBusy,
+    not_found_error,
+    service_unavailable_error,
+    validation_error,
+)
 
 router = APIRouter(tags=['User'], prefix='/users')
 
@@ -26,14 +34,46 @@ async def read_me(
             'description': 'Username or email is already used',
             'model': schemas.ErrorMessage,
         },
+        503: {
+            'description': 'Too many password hashes in progress',
+            'model': schemas.ErrorMessage,
+        },
     },
     status_code=status.HTTP_201_CREATED,
 )
 async def create_user(
     user: schemas.UserCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     try:
-        return crud.create_user(db, user=user)
+        return await crud.create_user(db, user=user)
     except crud.UserExists:
         raise validation_error('Username or email is already used')
+    except PasswordHasherBusy:
+        raise service_unavailable_error('Server is busy, try again')
+
+
+@router.get('/{username}', response_model=schemas.UserProfile)
+async def read_user(username: str, db: AsyncSession = Depends(get_db)):
+    user = await crud.get_user(db, username=username)
+    if not user:
+        raise not_found_error('Страница не найдена.')
+    return user
+
+
+@router.get(
+    '/{username}/posts/',
+    response_model=CursorPage[schemas.Post],
+    dependencies=[Depends(conditional_get('posts'))],
+)
+async def read_user_posts(
+    username: str,
+    params: Annotated[CursorParams, Depends(cursor_params)],
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+):
+    user = await crud.get_user(db, username=username)
+    if not user:
+        raise not_found_error('Страница не найдена.')
+    page = await crud.get_author_posts(db, author_id=user.id, params=params)
+    return page_response(page, post_row, response)
@@ -1,9 +1,19 @@
 from datetime import datetime
+from typing import Generic, TypeVar
 
-from pydantic import AliasPath, BaseModel, EmailStr, Field, field_validator
+from pydantic import (
+    AliasPath,
+    BaseModel,
+    ConfigDict,
+    EmailStr,
+    Field,
+    field_validator,
+)
 
 from app.config import MEDIA_URL
-from app.utils import save_image
+from app.storage import FILENAME_RE
+
+T = TypeVar('T')
 
 
 class ErrorMessage(BaseModel):
@@ -48,6 +58,12 @@ class User(UserBase):
     is_active: bool
 
 
+class UserProfile(BaseModel):
+    username: str
+    follower_count: int
+    following_count: int
+
+
 class UserInDB(User):
     id: int
     password: str
@@ -58,6 +74,7 @@ class Group(BaseModel):
     title: str
     slug: str
     description: str
+    post_count: int = 0
 
 
 class PostCreate(BaseModel):
@@ -67,16 +84,16 @@ class PostCreate(BaseModel):
 
     @field_validator('image')
     @classmethod
-    def save_image(cls, value: str | None) -> str | None:
-        if not value:
+    def check_image(cls, value: str | None) -> str | None:
+        # Either a data URI (saved later) or a name returned by /images/
+        if not value or value.startswith('data:image'):
             return value
-        if not value.startswith('data:image'):
-            raise ValueError('Картинка должна начинаться с `data:image`.')
-        try:
-            filename = save_image(value)
-        except Exception:
-            raise ValueError('Ошибка при сохранении файла.')
-        return filename
+        if not FILENAME_RE.fullmatch(value):
+            raise ValueError(
+                'Картинка должна начинаться с `data:image` '
+                'или быть именем загруженного файла.'
+            )
+        return value
 
 
 class PostUpdate(PostCreate):
@@ -96,15 +113,28 @@ class Post(BaseModel):
     text: str
     pub_date: datetime
     image: str | None
-    group: int | None = Field(
-        default=None, validation_alias=AliasPath('group', 'id')
-    )
+    group: int | None = Field(default=None, validation_alias='group_id')
+    image_variants: dict[str, str] | None = None
+    comment_count: int = 0
 
     @field_validator('image')
     @classmethod
     def relative_url(cls, value: str | None) -> str | None:
         return MEDIA_URL + value if value else value
 
+    @field_validator('image_variants')
+    @classmethod
+    def relative_urls(
+        cls, value: dict[str, str] | None
+    ) -> dict[str, str] | None:
+        if not value:
+            return value
+        return {variant: MEDIA_URL + name for variant, name in value.items()}
+
+
+class Image(BaseModel):
+    image: str
+
 
 class CommentCreate(BaseModel):
     text: str
@@ -119,7 +149,7 @@ class Comment(BaseModel):
     author: str = Field(validation_alias=AliasPath('author', 'username'))
     text: str
     created: datetime
-    post: int = Field(validation_alias=AliasPath('post', 'id'))
+    post: int = Field(validation_alias='post_id')
 
 
 class FollowCreate(BaseModel):
@@ -127,5 +157,15 @@ class FollowCreate(BaseModel):
 
 
 class Follow(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
     user: str = Field(validation_alias=AliasPath('user', 'username'))
     following: str = Field(validation_alias=AliasPath('following', 'username'))
+
+
+class BulkResult(BaseModel, Generic[T]):
+    """Outcome of one item of a bulk request: `error` holds what the
+    single-item endpoint would have answered with as `detail`."""
+
+    result: T | None = None
+    error: str | dict[str, list[str]] | None = None
@@ -0,0 +1,182 @@
+"""Full-text search of posts.
+
+Postgres matches and ranks posts with the generated `Post.search_vector`
+column and its GIN index. Where Postgres full-text search is not
+available (e.g. tests against another database), `MemorySearch` keeps
+an inverted index of post texts in the process instead: it is built on
+first use and updated by `app.crud` on writes made by this process only.
+"""
+import math
+import re
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Iterable
+
+from sqlalchemy import Float, Select, func, literal_column, select
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import SEARCH_CONFIG, Post
+from app.pagination import (
+    CursorPage,
+    CursorParams,
+    decode_cursor,
+    encode_cursor,
+    paginate,
+)
+
+WORD_RE = re.compile(r'\w+')
+
+
+class SearchBackend(ABC):
+    @abstractmethod
+    async def search(
+        self,
+        db: AsyncSession,
+        stmt: Select,
+        *,
+        query: str,
+        params: CursorParams,
+    ) -> CursorPage:
+        """Page of rows of `stmt` (a select of posts) matching `query`,
+        best matches first."""
+
+    def add(self, posts: Iterable[tuple[int, str]]) -> None:
+        """Index new or changed (id, text) pairs."""
+
+    def remove(self, post_id: int) -> None:
+        ...
+
+
+class PostgresSearch(SearchBackend):
+    async def search(
+        self,
+        db: AsyncSession,
+        stmt: Select,
+        *,
+        query: str,
+        params: CursorParams,
+    ) -> CursorPage:
+        config = literal_column(f"'{SEARCH_CONFIG}'::regconfig", REGCONFIG)
+        tsquery = func.websearch_to_tsquery(config, query)
+        rank = func.ts_rank(Post.search_vector, tsquery, type_=Float).label(
+            'rank'
+        )
+        return await paginate(
+            db,
+            stmt.add_columns(rank).where(
+                Post.search_vector.bool_op('@@')(tsquery)
+            ),
+            keys=(rank, Post.id),
+            params=params,
+            descending=True,
+            scalars=False,
+        )
+
+
+class InvertedIndex:
+    """Word -> {post id: number of occurrences}, ranked with TF-IDF."""
+
+    def __init__(self):
+        self.postings: defaultdict[str, dict[int, int]] = defaultdict(dict)
+        self.words: dict[int, set[str]] = {}
+
+    @staticmethod
+    def tokenize(text: str) -> list[str]:
+        return WORD_RE.findall(text.lower())
+
+    def add(self, post_id: int, text: str) -> None:
+        self.remove(post_id)
+        words = self.tokenize(text)
+        for word in words:
+            postings = self.postings[word]
+            postings[post_id] = postings.get(post_id, 0) + 1
+        self.words[post_id] = set(words)
+
+    def remove(self, post_id: int) -> None:
+        for word in self.words.pop(post_id, ()):
+            postings = self.postings[word]
+            del postings[post_id]
+            if not postings:
+                del self.postings[word]
+
+    def search(self, query: str) -> list[tuple[float, int]]:
+        """(score, post id) of posts containing every word of `query`,
+        best first."""
+        words = set(self.tokenize(query))
+        if not words or any(word not in self.postings for word in words):
+            return []
+        postings = sorted((self.postings[word] for word in words), key=len)
+        matches = set(postings[0]).intersection(*postings[1:])
+        total = len(self.words)
+        idf = [math.log(1 + total / len(p)) for p in postings]
+        results = [
+            (sum(p[post_id] * w for p, w in zip(postings, idf)), post_id)
+            for post_id in matches
+        ]
+        results.sort(reverse=True)
+        return results
+
+
+class MemorySearch(SearchBackend):
+    # Cursor values are (score, post id) like PostgresSearch's
+    keys = (literal_column('rank', Float), Post.id)
+
+    def __init__(self):
+        self.index: InvertedIndex | None = None
+
+    async def search(
+        self,
+        db: AsyncSession,
+        stmt: Select,
+        *,
+        query: str,
+        params: CursorParams,
+    ) -> CursorPage:
+        if self.index is None:
+            index = InvertedIndex()
+            for post_id, text in await db.execute(select(Post.id, Post.text)):
+                index.add(post_id, text)
+            self.index = index
+        matches = self.index.search(query)
+        total = len(matches) if params.include_total else None
+        if params.cursor is not None:
+            # Only forward cursors are produced
+            values, _ = decode_cursor(params.cursor, self.keys)
+            matches = [m for m in matches if m < tuple(values)]
+        page = matches[: params.size]
+
+        rows = {
+            row.id: row
+            for row in await db.execute(
+                stmt.where(Post.id.in_([post_id for _, post_id in page]))
+            )
+        }
+        next_cursor = None
+        if len(matches) > params.size:
+            next_cursor = encode_cursor(list(page[-1]), backwards=False)
+        return CursorPage(
+            # Posts deleted by other processes may still be indexed
+            items=[rows[post_id] for _, post_id in page if post_id in rows],
+            total=total,
+            next=next_cursor,
+        )
+
+    def add(self, posts: Iterable[tuple[int, str]]) -> None:
+        if self.index is not None:
+            for post_id, text in posts:
+                self.index.add(post_id, text)
+
+    def remove(self, post_id: int) -> None:
+        if self.index is not None:
+            self.index.remove(post_id)
+
+
+def make_search_backend(backend: str) -> SearchBackend:
+    if backend == 'memory':
+        return MemorySearch()
+    return PostgresSearch()
+
+
+search_backend = make_search_backend(settings.search_backend)
@@ -0,0 +1,105 @@
+"""Fast path for list responses.
+
+List endpoints select plain rows instead of ORM objects and turn them
+into JSON with orjson, skipping pydantic validation per row. The output
+must stay byte-for-byte equal to what FastAPI renders for the matching
+schemas in `app.schemas`, field order included.
+"""
+from typing import Any, Callable, Mapping, Sequence
+
+import orjson
+from fastapi import Response
+from sqlalchemy import Row
+
+from app.config import MEDIA_URL
+from app.pagination import CursorPage
+
+
+def media_url(name: str | None) -> str | None:
+    return MEDIA_URL + name if name else name
+
+
+def post_row(row: Row) -> dict[str, Any]:
+    variants = row.image_variants
+    return {
+        'id': row.id,
+        'author': row.author,
+        'text': row.text,
+        'pub_date': row.pub_date,
+        'image': media_url(row.image),
+        'group': row.group,
+        'image_variants': (
+            {variant: MEDIA_URL + name for variant, name in variants.items()}
+            if variants
+            else variants
+        ),
+        'comment_count': row.comment_count,
+    }
+
+
+def comment_row(row: Row) -> dict[str, Any]:
+    return {
+        'id': row.id,
+        'author': row.author,
+        'text': row.text,
+        'created': row.created,
+        'post': row.post,
+    }
+
+
+def follow_row(username: str) -> Callable[[Row], dict[str, Any]]:
+    def encode(row: Row) -> dict[str, Any]:
+        return {'user': username, 'following': row.following}
+
+    return encode
+
+
+def page_response(
+    page: CursorPage,
+    encode_row: Callable[[Row], dict[str, Any]],
+    response: Response | None = None,
+) -> Response:
+    """Render a page of rows; headers already set on the injected
+    `response` (e.g. by `conditional_get`) are kept."""
+    body = orjson.dumps(
+        {
+            'items': [encode_row(row) for row in page.items],
+            'total': page.total,
+            'next': page.next,
+            'previous': page.previous,
+        },
+        # Pydantic writes UTC datetimes with a Z suffix
+        option=orjson.OPT_UTC_Z,
+    )
+    return json_response(body, response)
+
+
+def row_response(
+    row: Row, encode_row: Callable[[Row], dict[str, Any]]
+) -> Response:
+    return json_response(
+        orjson.dumps(encode_row(row), option=orjson.OPT_UTC_Z)
+    )
+
+
+def bulk_response(
+    results: Sequence[Any],
+    encode_result: Callable[[Any], dict[str, Any]],
+    errors: Mapping[type[Exception], Any],
+) -> Response:
+    """Render `schemas.BulkResult` items; exceptions among `results`
+    are replaced with their entry in `errors`."""
+    items = [
+        {'result': None, 'error': errors[type(result)]}
+        if isinstance(result, Exception)
+        else {'result': encode_result(result), 'error': None}
+        for result in results
+    ]
+    return json_response(orjson.dumps(items, option=orjson.OPT_UTC_Z))
+
+
+def json_response(body: bytes, response: Response | None = None) -> Response:
+    headers = response.headers if response is not None else None
+    return Response(
+        content=body, media_type='application/json', headers=headers
+    )
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import re
+from abc import ABC, abstractmethod
+from base64 import b64decode
+from functools import partial
+from pathlib import Path
+from typing import AsyncIterable, Callable
+from uuid import uuid4
+
+from anyio import open_file, to_thread
+from PIL import Image
+
+from app.config import MEDIA_ROOT, settings
+
+FILENAME_RE = re.compile(r'[0-9a-f]{64}\.[a-z0-9]+')
+# Pillow format -> extension, for the formats accepted as uploads: ones
+# that browsers only ever render as images
+IMAGE_FORMATS = {'JPEG': 'jpeg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+# image/jpg isn't registered, but older clients send it in data URIs
+IMAGE_CONTENT_TYPES = frozenset(
+    {'image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'image/webp'}
+)
+
+
+class FileTooLarge(Exception):
+    pass
+
+
+class InvalidFileType(Exception):
+    pass
+
+
+class Storage(ABC):
+    """Content-addressed file storage: files are named by their SHA-256,
+    so identical uploads are stored once."""
+
+    @abstractmethod
+    async def save(
+        self,
+        chunks: AsyncIterable[bytes],
+        *,
+        detect_ext: Callable[[Path], str],
+        max_size: int | None = None,
+    ) -> str:
+        """Store a stream of chunks and return the file name.
+
+        `detect_ext` is called in a worker thread with the received file
+        and returns its extension; its exceptions reject the file.
+        Raises `FileTooLarge` as soon as more than `max_size` bytes
+        have been received.
+        """
+
+    @abstractmethod
+    async def exists(self, name: str) -> bool:
+        ...
+
+    @abstractmethod
+    def path(self, name: str) -> Path:
+        """Local file of a stored name, for serving and processing it."""
+
+
+class LocalStorage(Storage):
+    def __init__(self, root: Path):
+        self.root = root
+
+    def path(self, name: str) -> Path:
+        return self.root / name
+
+    async def save(
+        self,
+        chunks: AsyncIterable[bytes],
+        *,
+        detect_ext: Callable[[Path], str],
+        max_size: int | None = None,
+    ) -> str:
+        await to_thread.run_sync(partial(self.root.mkdir, exist_ok=True))
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path = self.root / f'.upload-{uuid4()}'
+        try:
+            async with await open_file(tmp_path, 'wb') as f:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise FileTooLarge
+                    digest.update(chunk)
+                    await f.write(chunk)
+            ext = await to_thread.run_sync(detect_ext, tmp_path)
+            name = f'{digest.hexdigest()}.{ext}'
+            # Replacing an existing file is harmless: the content is equal
+            await to_thread.run_sync(os.replace, tmp_path, self.path(name))
+        except BaseException:
+            await to_thread.run_sync(partial(tmp_path.unlink, missing_ok=True))
+            raise
+        return name
+
+    async def exists(self, name: str) -> bool:
+        return await to_thread.run_sync(self.path(name).is_file)
+
+
+storage = LocalStorage(MEDIA_ROOT)
+
+
+def check_image_type(content_type: str) -> None:
+    """Reject uploads declared as anything but an accepted format early;
+    the stored extension comes from the content, see `image_extension`."""
+    media_type = content_type.partition(';')[0].strip().lower()
+    if media_type not in IMAGE_CONTENT_TYPES:
+        raise InvalidFileType
+
+
+def image_extension(path: Path) -> str:
+    """Extension of an image file, detected from its content, so that a
+    file is never stored under a type that browsers would run."""
+    try:
+        with Image.open(path, formats=list(IMAGE_FORMATS)) as img:
+            img_format = img.format
+            img.verify()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        raise InvalidFileType
+    return IMAGE_FORMATS[img_format]  # type: ignore[index]
+
+
+async def save_data_uri(data_uri: str) -> str:
+    """Store an image sent as `data:image/<ext>;base64,<data>`."""
+    img_format, img_str = data_uri.split(';base64,')
+    check_image_type(img_format.removeprefix('data:'))
+    img_bytes = b64decode(img_str)
+
+    async def chunks():
+        yield img_bytes
+
+    return await storage.save(
+        chunks(), detect_ext=image_extension, max_size=settings.max_image_size
+    )
@@ -1,21 +1,55 @@
-from base64 import b64decode
-from uuid import uuid4
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
-from fastapi import HTTPException, Query, status
-from fastapi_pagination.links import LimitOffsetPage
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
-from app.config import MEDIA_ROOT
+from app.config import settings
+
+# Pinning min/max to the configured cost makes hashes with any other cost
+# "need update", so they are rehashed on the next successful login
+pwd_context = CryptContext(
+    schemes=['bcrypt'],
+    deprecated='auto',
+    bcrypt__rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds,
+)
+
+# bcrypt releases the GIL, so threads are enough to keep it off the loop
+password_hasher = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers,
+    thread_name_prefix='password-hasher',
+)
+password_hasher_slots = asyncio.Semaphore(
+    settings.password_hash_workers + settings.password_hash_queue
+)
+
+
+class PasswordHasherBusy(Exception):
+    pass
 
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 
+async def run_password_hasher(func, *args):
+    if password_hasher_slots.locked():
+        raise PasswordHasherBusy
+    async with password_hasher_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_hasher, func, *args)
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+
+async def verify_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    """Return whether the password matches and, if so, an updated hash
+    when the stored one uses an outdated scheme or cost."""
+    return await run_password_hasher(
+        pwd_context.verify_and_update, plain_password, hashed_password
+    )
 
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password: str) -> str:
+    return await run_password_hasher(pwd_context.hash, password)
 
 
 def not_found_error(message):
@@ -32,17 +66,15 @@ def not_author_error(message):
     return HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=message)
 
 
-Page = LimitOffsetPage.with_custom_options(
-    limit=Query(10, ge=1, le=500),
-)
+def too_large_error(message):
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=message
+    )
 
 
-def save_image(base64_encoded: str) -> str:
-    img_format, img_str = base64_encoded.split(';base64,')
-    ext = img_format.split('/')[-1]
-    filename = f'{uuid4()}.{ext}'
-    img_bytes = b64decode(img_str)
-    MEDIA_ROOT.mkdir(exist_ok=True)
-    with open(MEDIA_ROOT / filename, 'wb') as f:
-        f.write(img_bytes)
-    return filename
+def service_unavailable_error(message):
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=message,
+        headers={'Retry-After': '1'},
+    )
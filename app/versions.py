@@ -0,0 +1,82 @@
+from typing import Iterable, Sequence
+
+from sqlalchemy import Connection, event, select
+from sqlalchemy.dialects.postgresql import Insert, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.sql import func
+from sqlalchemy.util import await_only
+
+from app.cache import response_cache
+from app.models import Group, ResourceVersion
+
+CHANGED_RESOURCES = 'changed_resources'
+ORM_CHANGED_RESOURCES = 'orm_changed_resources'
+
+
+def upsert_versions(keys: Iterable[str]) -> Insert:
+    # Sorted, so that concurrent writers lock the rows in the same order
+    return (
+        insert(ResourceVersion)
+        .values([{'key': key} for key in sorted(set(keys))])
+        .on_conflict_do_update(
+            index_elements=[ResourceVersion.key],
+            set_={
+                'version': ResourceVersion.version + 1,
+                'modified': func.now(),
+            },
+        )
+    )
+
+
+async def bump_versions(db: AsyncSession, *keys: str) -> None:
+    """Mark resources as changed; call inside the writing transaction
+    and finish it with `commit` to also invalidate cached responses."""
+    await db.execute(upsert_versions(keys))
+    db.info.setdefault(CHANGED_RESOURCES, set()).update(keys)
+
+
+async def commit(db: AsyncSession) -> None:
+    await db.commit()
+    changed = db.info.pop(CHANGED_RESOURCES, None)
+    if changed:
+        await response_cache.invalidate(*changed)
+
+
+async def get_versions(
+    db: AsyncSession, keys: Iterable[str]
+) -> Sequence[ResourceVersion]:
+    return (
+        await db.scalars(
+            select(ResourceVersion)
+            .where(ResourceVersion.key.in_(keys))
+            .order_by(ResourceVersion.key)
+        )
+    ).all()
+
+
+# The API never writes groups, they are managed directly through the ORM.
+# Mapper events run during the flush, so the changed resources are kept on
+# the session and their cached responses are invalidated after the commit.
+@event.listens_for(Group, 'after_insert')
+@event.listens_for(Group, 'after_update')
+@event.listens_for(Group, 'after_delete')
+def bump_group_versions(mapper, connection: Connection, target: Group):
+    keys = ['groups', f'group:{target.id}']
+    connection.execute(upsert_versions(keys))
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(ORM_CHANGED_RESOURCES, set()).update(keys)
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_orm_changes(session: Session) -> None:
+    changed = session.info.pop(ORM_CHANGED_RESOURCES, None)
+    if changed:
+        # Called from AsyncSession.commit, which runs it in a greenlet
+        await_only(response_cache.invalidate(*changed))
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_orm_changes(session: Session) -> None:
+    session.info.pop(ORM_CHANGED_RESOURCES, None)
@@ -0,0 +1,93 @@
+"""Compare rows/sec of single-item and bulk creation of posts and comments.
+
+Needs a running server and an existing user; the created rows are kept:
+
+    python -m benchmarks.bulk_writes -u alice -p secret -n 2000 --batch 500
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+async def single(
+    client: httpx.AsyncClient, path: str, items: list[dict], concurrency: int
+) -> None:
+    queue = list(reversed(items))
+
+    async def worker():
+        while queue:
+            response = await client.post(path, json=queue.pop())
+            response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def bulk(
+    client: httpx.AsyncClient, path: str, items: list[dict], batch: int
+) -> None:
+    for i in range(0, len(items), batch):
+        response = await client.post(path, json=items[i : i + batch])
+        response.raise_for_status()
+        errors = [item['error'] for item in response.json() if item['error']]
+        if errors:
+            raise SystemExit(f'{path}: {errors[0]}')
+
+
+async def measure(name: str, count: int, coro) -> None:
+    start = time.perf_counter()
+    await coro
+    elapsed = time.perf_counter() - start
+    print(f'{name}: {count / elapsed:.1f} rows/s')
+
+
+async def run(args: argparse.Namespace) -> None:
+    credentials = {'username': args.username, 'password': args.password}
+    async with httpx.AsyncClient(base_url=args.base_url) as client:
+        response = await client.post('/api/v1/jwt/create/', json=credentials)
+        response.raise_for_status()
+        client.headers['Authorization'] = (
+            f'Bearer {response.json()["access"]}'
+        )
+        posts = [{'text': f'Пост {i}'} for i in range(args.count)]
+        await measure(
+            'posts, one per request',
+            args.count,
+            single(client, '/api/v1/posts/', posts, args.concurrency),
+        )
+        await measure(
+            f'posts, {args.batch} per request',
+            args.count,
+            bulk(client, '/api/v1/posts/bulk/', posts, args.batch),
+        )
+
+        response = await client.post('/api/v1/posts/', json={'text': 'Пост'})
+        response.raise_for_status()
+        path = f'/api/v1/posts/{response.json()["id"]}/comments/'
+        comments = [{'text': f'Комментарий {i}'} for i in range(args.count)]
+        await measure(
+            'comments, one per request',
+            args.count,
+            single(client, path, comments, args.concurrency),
+        )
+        await measure(
+            f'comments, {args.batch} per request',
+            args.count,
+            bulk(client, f'{path}bulk/', comments, args.batch),
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-u', '--username', required=True)
+    parser.add_argument('-p', '--password', required=True)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('-n', '--count', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('-c', '--concurrency', type=int, default=10)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
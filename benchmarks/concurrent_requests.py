@@ -0,0 +1,62 @@
+"""Measure throughput of concurrent requests against a running server.
+
+Run the server (`uvicorn app.main:app --workers 1`) once on the old
+commit and once on the new one, then compare the reported numbers:
+
+    python -m benchmarks.concurrent_requests /api/v1/posts/ -c 50 -n 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def worker(
+    client: httpx.AsyncClient, path: str, count: int, latencies: list[float]
+) -> None:
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await client.get(path)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+
+
+async def run(base_url: str, path: str, concurrency: int, total: int) -> None:
+    latencies: list[float] = []
+    per_worker = total // concurrency
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                worker(client, path, per_worker, latencies)
+                for _ in range(concurrency)
+            )
+        )
+        elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f'{len(latencies)} requests in {elapsed:.2f}s')
+    print(f'throughput: {len(latencies) / elapsed:.1f} req/s')
+    print(
+        f'latency p50/p95/p99: {quantiles[49] * 1000:.1f}/'
+        f'{quantiles[94] * 1000:.1f}/{quantiles[98] * 1000:.1f} ms'
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', nargs='?', default='/api/v1/posts/')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('-c', '--concurrency', type=int, default=50)
+    parser.add_argument('-n', '--requests', type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(
+        run(args.base_url, args.path, args.concurrency, args.requests)
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,702 @@
+"""Seed a dataset and load-test every API endpoint of a running server.
+
+Seeding goes through the API (bulk endpoints where possible) and saves
+what it created to a dataset file that later runs reuse:
+
+    python -m benchmarks.load_test seed --users 200 --posts 5000
+    python -m benchmarks.load_test run -o benchmarks/baseline.json
+    python -m benchmarks.load_test run --baseline benchmarks/baseline.json
+
+Authors, followed users and commented posts are picked with power-law
+weights, so a few of them get most of the activity. Creating users and
+logging in hash passwords: start the server with YATUBE_BCRYPT_ROUNDS=4
+to seed large datasets quickly. `run` exits with status 1 when a
+scenario regressed against the baseline.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable
+
+import httpx
+
+API = '/api/v1'
+PASSWORD = 'load-test-password'
+WORDS = (
+    'кот пёс дом лес река город море солнце дождь снег ветер небо '
+    'книга письмо музыка песня фильм кино театр поезд дорога мост'
+).split()
+BATCH_SIZE = 500
+
+
+@dataclass
+class Dataset:
+    users: list[str] = field(default_factory=list)
+    posts: list[int] = field(default_factory=list)
+    # [post id, comment id] pairs
+    comments: list[list[int]] = field(default_factory=list)
+    groups: list[int] = field(default_factory=list)
+
+    def save(self, path: Path) -> None:
+        path.write_text(json.dumps(asdict(self)))
+
+    @classmethod
+    def load(cls, path: Path) -> 'Dataset':
+        return cls(**json.loads(path.read_text()))
+
+
+@dataclass
+class Session:
+    username: str
+    access: str = ''
+    refresh: str = ''
+    own_post: int | None = None
+    own_comment: tuple[int, int] | None = None
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {'Authorization': f'Bearer {self.access}'}
+
+
+def text(rng: random.Random) -> str:
+    return ' '.join(rng.choices(WORDS, k=rng.randint(5, 30)))
+
+
+def power_law_picker(
+    items: list, rng: random.Random, exponent: float = 1.1
+) -> Callable[[], object]:
+    """Pick items with weights 1/rank^exponent, ranks in random order."""
+    ranked = items[:]
+    rng.shuffle(ranked)
+    weights = list(
+        itertools.accumulate(
+            1 / (rank + 1) ** exponent for rank in range(len(items))
+        )
+    )
+    return lambda: rng.choices(ranked, cum_weights=weights)[0]
+
+
+async def gather_limited(coros: Iterable[Awaitable], limit: int) -> list:
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros))
+
+
+async def login(client: httpx.AsyncClient, session: Session) -> None:
+    response = await client.post(
+        f'{API}/jwt/create/',
+        json={'username': session.username, 'password': PASSWORD},
+    )
+    response.raise_for_status()
+    session.access = response.json()['access']
+    session.refresh = response.json()['refresh']
+
+
+async def refresh(client: httpx.AsyncClient, session: Session) -> None:
+    response = await client.post(
+        f'{API}/jwt/refresh/', json={'refresh': session.refresh}
+    )
+    response.raise_for_status()
+    session.access = response.json()['access']
+
+
+async def post_json(
+    client: httpx.AsyncClient, session: Session, path: str, data
+) -> httpx.Response:
+    response = await client.post(path, json=data, headers=session.headers)
+    if response.status_code == 401:  # Access tokens are short-lived
+        await refresh(client, session)
+        response = await client.post(path, json=data, headers=session.headers)
+    response.raise_for_status()
+    return response
+
+
+async def seed(args: argparse.Namespace) -> None:
+    rng = random.Random(args.random_seed)
+    prefix = f'load{rng.getrandbits(24):06x}'
+    sessions = {
+        username: Session(username)
+        for username in (f'{prefix}-{i}' for i in range(args.users))
+    }
+    dataset = Dataset(users=list(sessions))
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=60
+    ) as client:
+        start = time.perf_counter()
+
+        async def create_user(session: Session) -> None:
+            response = await client.post(
+                f'{API}/users/',
+                json={
+                    'username': session.username,
+                    'email': f'{session.username}@example.com',
+                    'password': PASSWORD,
+                },
+            )
+            response.raise_for_status()
+            await login(client, session)
+
+        await gather_limited(
+            (create_user(s) for s in sessions.values()), args.concurrency
+        )
+        print(f'{args.users} users in {time.perf_counter() - start:.1f}s')
+
+        response = await client.get(f'{API}/groups/')
+        response.raise_for_status()
+        dataset.groups = [group['id'] for group in response.json()]
+        groups = [None, *dataset.groups]
+
+        start = time.perf_counter()
+        pick_author = power_law_picker(dataset.users, rng)
+        posts_by_author = defaultdict(list)
+        for _ in range(args.posts):
+            posts_by_author[pick_author()].append(
+                {'text': text(rng), 'group': rng.choice(groups)}
+            )
+
+        async def create_posts(username: str, posts: list[dict]) -> None:
+            for i in range(0, len(posts), BATCH_SIZE):
+                response = await post_json(
+                    client,
+                    sessions[username],
+                    f'{API}/posts/bulk/',
+                    posts[i : i + BATCH_SIZE],
+                )
+                dataset.posts.extend(
+                    item['result']['id'] for item in response.json()
+                )
+
+        await gather_limited(
+            itertools.starmap(create_posts, posts_by_author.items()),
+            args.concurrency,
+        )
+        print(f'{args.posts} posts in {time.perf_counter() - start:.1f}s')
+
+        start = time.perf_counter()
+        pick_following = power_law_picker(dataset.users, rng)
+        follows = defaultdict(set)
+        for _ in range(args.follows):
+            user, following = rng.choice(dataset.users), pick_following()
+            if user != following:
+                follows[user].add(following)
+
+        async def create_follows(username: str, following: set[str]) -> None:
+            await post_json(
+                client,
+                sessions[username],
+                f'{API}/follow/bulk/',
+                [{'following': name} for name in sorted(following)],
+            )
+
+        await gather_limited(
+            itertools.starmap(create_follows, follows.items()),
+            args.concurrency,
+        )
+        print(
+            f'{sum(map(len, follows.values()))} follows '
+            f'in {time.perf_counter() - start:.1f}s'
+        )
+
+        start = time.perf_counter()
+        pick_post = power_law_picker(dataset.posts, rng)
+        comments = defaultdict(list)
+        for _ in range(args.comments if dataset.posts else 0):
+            author = rng.choice(dataset.users)
+            comments[pick_post(), author].append({'text': text(rng)})
+
+        async def create_comments(key: tuple[int, str], items: list[dict]):
+            post_id, username = key
+            response = await post_json(
+                client,
+                sessions[username],
+                f'{API}/posts/{post_id}/comments/bulk/',
+                items,
+            )
+            dataset.comments.extend(
+                [post_id, item['result']['id']] for item in response.json()
+            )
+
+        await gather_limited(
+            itertools.starmap(create_comments, comments.items()),
+            args.concurrency,
+        )
+        print(
+            f'{args.comments} comments in {time.perf_counter() - start:.1f}s'
+        )
+
+    dataset.save(args.dataset)
+    print(f'dataset saved to {args.dataset}')
+
+
+@dataclass
+class Context:
+    client: httpx.AsyncClient
+    dataset: Dataset
+    rng: random.Random
+
+    def build(
+        self, method: str, path: str, session: Session | None = None, **kw
+    ) -> httpx.Request:
+        headers = session.headers if session is not None else None
+        return self.client.build_request(
+            method, f'{API}{path}', headers=headers, **kw
+        )
+
+    def post_id(self) -> int:
+        return self.rng.choice(self.dataset.posts)
+
+    def username(self) -> str:
+        return self.rng.choice(self.dataset.users)
+
+
+# Scenario: prepares state untimed and returns the request to time
+Scenario = Callable[[Context, Session], Awaitable[httpx.Request]]
+SCENARIOS: dict[str, Scenario] = {}
+
+
+def scenario(name: str):
+    def register(func: Scenario) -> Scenario:
+        SCENARIOS[name] = func
+        return func
+
+    return register
+
+
+async def create_own_post(ctx: Context, session: Session) -> int:
+    response = await ctx.client.send(
+        ctx.build('POST', '/posts/', session, json={'text': text(ctx.rng)})
+    )
+    response.raise_for_status()
+    return response.json()['id']
+
+
+async def create_own_comment(
+    ctx: Context, session: Session
+) -> tuple[int, int]:
+    post_id = ctx.post_id()
+    response = await ctx.client.send(
+        ctx.build(
+            'POST',
+            f'/posts/{post_id}/comments/',
+            session,
+            json={'text': text(ctx.rng)},
+        )
+    )
+    response.raise_for_status()
+    return post_id, response.json()['id']
+
+
+@scenario('POST /jwt/create/')
+async def jwt_create(ctx: Context, session: Session):
+    return ctx.build(
+        'POST',
+        '/jwt/create/',
+        json={'username': session.username, 'password': PASSWORD},
+    )
+
+
+@scenario('POST /jwt/refresh/')
+async def jwt_refresh(ctx: Context, session: Session):
+    return ctx.build(
+        'POST', '/jwt/refresh/', json={'refresh': session.refresh}
+    )
+
+
+@scenario('POST /jwt/verify/')
+async def jwt_verify(ctx: Context, session: Session):
+    return ctx.build('POST', '/jwt/verify/', json={'token': session.access})
+
+
+@scenario('GET /posts/')
+async def read_posts(ctx: Context, session: Session):
+    return ctx.build('GET', '/posts/')
+
+
+@scenario('GET /posts/search')
+async def search_posts(ctx: Context, session: Session):
+    query = ' '.join(ctx.rng.sample(WORDS, 2))
+    return ctx.build('GET', '/posts/search', params={'q': query})
+
+
+@scenario('GET /posts/{post_id}')
+async def read_post(ctx: Context, session: Session):
+    return ctx.build('GET', f'/posts/{ctx.post_id()}')
+
+
+@scenario('POST /posts/')
+async def create_post(ctx: Context, session: Session):
+    return ctx.build('POST', '/posts/', session, json={'text': text(ctx.rng)})
+
+
+@scenario('POST /posts/bulk/')
+async def create_posts(ctx: Context, session: Session):
+    posts = [{'text': text(ctx.rng)} for _ in range(10)]
+    return ctx.build('POST', '/posts/bulk/', session, json=posts)
+
+
+@scenario('PATCH /posts/{post_id}')
+async def partial_update_post(ctx: Context, session: Session):
+    if session.own_post is None:
+        session.own_post = await create_own_post(ctx, session)
+    return ctx.build(
+        'PATCH',
+        f'/posts/{session.own_post}',
+        session,
+        json={'text': text(ctx.rng)},
+    )
+
+
+@scenario('PUT /posts/{post_id}')
+async def update_post(ctx: Context, session: Session):
+    if session.own_post is None:
+        session.own_post = await create_own_post(ctx, session)
+    return ctx.build(
+        'PUT',
+        f'/posts/{session.own_post}',
+        session,
+        json={'text': text(ctx.rng)},
+    )
+
+
+@scenario('DELETE /posts/{post_id}')
+async def delete_post(ctx: Context, session: Session):
+    post_id = await create_own_post(ctx, session)
+    return ctx.build('DELETE', f'/posts/{post_id}', session)
+
+
+@scenario('GET /posts/{post_id}/comments/')
+async def read_comments(ctx: Context, session: Session):
+    return ctx.build('GET', f'/posts/{ctx.post_id()}/comments/')
+
+
+@scenario('GET /posts/{post_id}/comments/{comment_id}')
+async def read_comment(ctx: Context, session: Session):
+    if not ctx.dataset.comments:
+        post_id, comment_id = await create_own_comment(ctx, session)
+    else:
+        post_id, comment_id = ctx.rng.choice(ctx.dataset.comments)
+    return ctx.build('GET', f'/posts/{post_id}/comments/{comment_id}')
+
+
+@scenario('POST /posts/{post_id}/comments/')
+async def create_comment(ctx: Context, session: Session):
+    return ctx.build(
+        'POST',
+        f'/posts/{ctx.post_id()}/comments/',
+        session,
+        json={'text': text(ctx.rng)},
+    )
+
+
+@scenario('POST /posts/{post_id}/comments/bulk/')
+async def create_comments(ctx: Context, session: Session):
+    comments = [{'text': text(ctx.rng)} for _ in range(10)]
+    return ctx.build(
+        'POST',
+        f'/posts/{ctx.post_id()}/comments/bulk/',
+        session,
+        json=comments,
+    )
+
+
+@scenario('PATCH /posts/{post_id}/comments/{comment_id}')
+async def partial_update_comment(ctx: Context, session: Session):
+    if session.own_comment is None:
+        session.own_comment = await create_own_comment(ctx, session)
+    post_id, comment_id = session.own_comment
+    return ctx.build(
+        'PATCH',
+        f'/posts/{post_id}/comments/{comment_id}',
+        session,
+        json={'text': text(ctx.rng)},
+    )
+
+
+@scenario('PUT /posts/{post_id}/comments/{comment_id}')
+async def update_comment(ctx: Context, session: Session):
+    if session.own_comment is None:
+        session.own_comment = await create_own_comment(ctx, session)
+    post_id, comment_id = session.own_comment
+    return ctx.build(
+        'PUT',
+        f'/posts/{post_id}/comments/{comment_id}',
+        session,
+        json={'text': text(ctx.rng)},
+    )
+
+
+@scenario('DELETE /posts/{post_id}/comments/{comment_id}')
+async def delete_comment(ctx: Context, session: Session):
+    post_id, comment_id = await create_own_comment(ctx, session)
+    return ctx.build(
+        'DELETE', f'/posts/{post_id}/comments/{comment_id}', session
+    )
+
+
+@scenario('GET /feed/')
+async def read_feed(ctx: Context, session: Session):
+    return ctx.build('GET', '/feed/', session)
+
+
+@scenario('GET /follow/')
+async def read_follows(ctx: Context, session: Session):
+    return ctx.build('GET', '/follow/', session)
+
+
+@scenario('POST /follow/')
+async def create_follow(ctx: Context, session: Session):
+    username = ctx.username()
+    # Make sure the follow doesn't exist yet, unless it is oneself
+    await ctx.client.send(ctx.build('DELETE', f'/follow/{username}', session))
+    return ctx.build('POST', '/follow/', session, json={'following': username})
+
+
+@scenario('POST /follow/bulk/')
+async def create_follows(ctx: Context, session: Session):
+    follows = [{'following': ctx.username()} for _ in range(10)]
+    return ctx.build('POST', '/follow/bulk/', session, json=follows)
+
+
+@scenario('DELETE /follow/{username}')
+async def delete_follow(ctx: Context, session: Session):
+    username = ctx.username()
+    await ctx.client.send(
+        ctx.build('POST', '/follow/', session, json={'following': username})
+    )
+    return ctx.build('DELETE', f'/follow/{username}', session)
+
+
+@scenario('GET /groups/')
+async def read_groups(ctx: Context, session: Session):
+    return ctx.build('GET', '/groups/')
+
+
+@scenario('GET /groups/{group_id}')
+async def read_group(ctx: Context, session: Session):
+    return ctx.build('GET', f'/groups/{ctx.rng.choice(ctx.dataset.groups)}')
+
+
+@scenario('GET /groups/{group_id}/posts/')
+async def read_group_posts(ctx: Context, session: Session):
+    group_id = ctx.rng.choice(ctx.dataset.groups)
+    return ctx.build('GET', f'/groups/{group_id}/posts/')
+
+
+@scenario('GET /users/me')
+async def read_me(ctx: Context, session: Session):
+    return ctx.build('GET', '/users/me', session)
+
+
+@scenario('POST /users/')
+async def create_user(ctx: Context, session: Session):
+    username = f'load{ctx.rng.getrandbits(48):012x}'
+    return ctx.build(
+        'POST',
+        '/users/',
+        json={
+            'username': username,
+            'email': f'{username}@example.com',
+            'password': PASSWORD,
+        },
+    )
+
+
+@scenario('GET /users/{username}')
+async def read_user(ctx: Context, session: Session):
+    return ctx.build('GET', f'/users/{ctx.username()}')
+
+
+@scenario('GET /users/{username}/posts/')
+async def read_user_posts(ctx: Context, session: Session):
+    return ctx.build('GET', f'/users/{ctx.username()}/posts/')
+
+
+async def measure(
+    ctx: Context,
+    func: Scenario,
+    sessions: list[Session],
+    *,
+    concurrency: int,
+    total: int,
+) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            request = await func(ctx, ctx.rng.choice(sessions))
+            start = time.perf_counter()
+            response = await ctx.client.send(request)
+            latencies.append(time.perf_counter() - start)
+            if response.is_error:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / elapsed,
+        'p50': quantiles[49],
+        'p95': quantiles[94],
+        'p99': quantiles[98],
+    }
+
+
+async def run(args: argparse.Namespace) -> int:
+    dataset = Dataset.load(args.dataset)
+    rng = random.Random(args.random_seed)
+    names = [
+        name
+        for name in SCENARIOS
+        if not args.only or any(part in name for part in args.only)
+    ]
+    if not dataset.groups:
+        names = [name for name in names if '{group_id}' not in name]
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=60
+    ) as client:
+        ctx = Context(client=client, dataset=dataset, rng=rng)
+        sessions = [
+            Session(username)
+            for username in rng.sample(
+                dataset.users, min(args.sessions, len(dataset.users))
+            )
+        ]
+        await gather_limited(
+            (login(client, s) for s in sessions), args.concurrency
+        )
+        for name in names:
+            # Access tokens expire after a few minutes
+            await gather_limited(
+                (refresh(client, s) for s in sessions), args.concurrency
+            )
+            results[name] = await measure(
+                ctx,
+                SCENARIOS[name],
+                sessions,
+                concurrency=args.concurrency,
+                total=args.requests,
+            )
+            print_result(name, results[name])
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'concurrency': args.concurrency,
+        'requests': args.requests,
+        'results': results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())['results']
+        return compare(results, baseline, args.tolerance)
+    return 0
+
+
+def print_result(name: str, result: dict) -> None:
+    print(
+        f'{name:<48} {result["throughput"]:8.1f} req/s  '
+        f'p50/p95/p99 {result["p50"] * 1000:.1f}/'
+        f'{result["p95"] * 1000:.1f}/{result["p99"] * 1000:.1f} ms'
+        + (f'  {result["errors"]} errors' if result['errors'] else '')
+    )
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> int:
+    """Print scenarios that got slower than `baseline` by more than
+    `tolerance` (a fraction) and return the exit status."""
+    regressions = 0
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        problems = []
+        if result['p95'] > base['p95'] * (1 + tolerance):
+            problems.append(
+                f'p95 {base["p95"] * 1000:.1f} -> '
+                f'{result["p95"] * 1000:.1f} ms'
+            )
+        if result['throughput'] < base['throughput'] * (1 - tolerance):
+            problems.append(
+                f'throughput {base["throughput"]:.1f} -> '
+                f'{result["throughput"]:.1f} req/s'
+            )
+        if result['errors'] > base['errors']:
+            problems.append(f'errors {base["errors"]} -> {result["errors"]}')
+        if problems:
+            regressions += 1
+            print(f'REGRESSION {name}: {", ".join(problems)}')
+    print(f'{regressions} regressions against the baseline')
+    return 1 if regressions else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument(
+        '--dataset', type=Path, default=Path('benchmarks/dataset.json')
+    )
+    parser.add_argument('--random-seed', type=int, default=0)
+    parser.add_argument('-c', '--concurrency', type=int, default=20)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help='create a dataset')
+    seed_parser.add_argument('--users', type=int, default=200)
+    seed_parser.add_argument('--posts', type=int, default=5000)
+    seed_parser.add_argument('--follows', type=int, default=4000)
+    seed_parser.add_argument('--comments', type=int, default=20000)
+
+    run_parser = commands.add_parser('run', help='load-test the endpoints')
+    run_parser.add_argument(
+        '-n', '--requests', type=int, default=500, help='per scenario'
+    )
+    run_parser.add_argument(
+        '--sessions', type=int, default=50, help='users logged in at once'
+    )
+    run_parser.add_argument(
+        '--only', nargs='*', help='run scenarios containing these strings'
+    )
+    run_parser.add_argument(
+        '-o', '--output', type=Path, help='save results as JSON'
+    )
+    run_parser.add_argument(
+        '--baseline', type=Path, help='results JSON to compare with'
+    )
+    run_parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.2,
+        help='allowed slowdown as a fraction (default: 0.2)',
+    )
+
+    args = parser.parse_args()
+    if args.command == 'seed':
+        asyncio.run(seed(args))
+    else:
+        sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == '__main__':
+    main()
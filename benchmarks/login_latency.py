@@ -0,0 +1,83 @@
+"""Measure latency of unrelated GETs while logins are hammering bcrypt.
+
+Needs a running server and an existing user:
+
+    python -m benchmarks.login_latency -u alice -p secret --logins 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def login_loop(
+    client: httpx.AsyncClient, credentials: dict, stop: asyncio.Event
+) -> tuple[int, int]:
+    done = rejected = 0
+    while not stop.is_set():
+        response = await client.post('/api/v1/jwt/create/', json=credentials)
+        if response.status_code == 503:
+            rejected += 1
+        else:
+            response.raise_for_status()
+            done += 1
+    return done, rejected
+
+
+async def get_loop(
+    client: httpx.AsyncClient, path: str, count: int, latencies: list[float]
+) -> None:
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await client.get(path)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+
+
+async def run(args: argparse.Namespace) -> None:
+    credentials = {'username': args.username, 'password': args.password}
+    latencies: list[float] = []
+    stop = asyncio.Event()
+    async with httpx.AsyncClient(base_url=args.base_url) as client:
+        logins = [
+            asyncio.create_task(login_loop(client, credentials, stop))
+            for _ in range(args.logins)
+        ]
+        await asyncio.gather(
+            *(
+                get_loop(client, args.path, args.requests, latencies)
+                for _ in range(args.concurrency)
+            )
+        )
+        stop.set()
+        results = await asyncio.gather(*logins)
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f'logins: {sum(done for done, _ in results)} ok, '
+        f'{sum(rejected for _, rejected in results)} rejected with 503'
+    )
+    print(
+        f'GET {args.path} p50/p95/p99: {quantiles[49] * 1000:.1f}/'
+        f'{quantiles[94] * 1000:.1f}/{quantiles[98] * 1000:.1f} ms'
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-u', '--username', required=True)
+    parser.add_argument('-p', '--password', required=True)
+    parser.add_argument('--path', default='/api/v1/groups/')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--logins', type=int, default=20)
+    parser.add_argument('-c', '--concurrency', type=int, default=10)
+    parser.add_argument(
+        '-n', '--requests', type=int, default=200, help='GETs per client'
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
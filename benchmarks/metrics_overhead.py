@@ -0,0 +1,84 @@
+"""Measure the CPU overhead of the metrics middleware and DB event hooks.
+
+Requests go to a small in-process app, without a server or database, so
+the relative overhead is an upper bound of what real endpoints see:
+
+    python -m benchmarks.metrics_overhead -n 5000
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+from fastapi import FastAPI
+
+from app.metrics import (
+    MetricsMiddleware,
+    _after_cursor_execute,
+    _before_cursor_execute,
+)
+
+STATEMENT = (
+    'SELECT post.id, "user".username AS author, post.text, post.pub_date '
+    'FROM post JOIN "user" ON "user".id = post.author_id '
+    'WHERE post.group_id = $1::INTEGER AND (post.pub_date, post.id) < '
+    '($2::TIMESTAMP WITH TIME ZONE, $3::INTEGER) '
+    'ORDER BY post.pub_date DESC, post.id DESC LIMIT $4::INTEGER'
+)
+
+
+def make_app(with_metrics: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get('/items/{item_id}')
+    async def read_item(item_id: int):
+        return {'id': item_id, 'text': 'item'}
+
+    if with_metrics:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def time_requests(app: FastAPI, count: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url='http://test'
+    ) as client:
+        await client.get('/items/0')  # Warm up
+        start = time.perf_counter()
+        for i in range(count):
+            response = await client.get(f'/items/{i}')
+            response.raise_for_status()
+    return (time.perf_counter() - start) / count
+
+
+def time_statement_hooks(count: int) -> float:
+    conn = SimpleNamespace(info={})
+    args = (None, STATEMENT, (), None, False)
+    start = time.perf_counter()
+    for _ in range(count):
+        _before_cursor_execute(conn, *args)
+        _after_cursor_execute(conn, *args)
+    return (time.perf_counter() - start) / count
+
+
+async def run(count: int) -> None:
+    plain = await time_requests(make_app(False), count)
+    instrumented = await time_requests(make_app(True), count)
+    print(f'request without metrics: {plain * 1e6:.1f} µs')
+    print(
+        f'request with metrics: {instrumented * 1e6:.1f} µs '
+        f'(+{(instrumented - plain) / plain:.1%})'
+    )
+    print(f'statement hooks: {time_statement_hooks(count) * 1e6:.1f} µs')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--requests', type=int, default=5000)
+    asyncio.run(run(parser.parse_args().requests))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Measure latency of post search on a large seeded corpus.
+
+Seeding inserts posts of random words (one statement, server side) by a
+dedicated user; pass --seed 0 to reuse an already seeded database:
+
+    python -m benchmarks.search_latency --seed 1000000 -n 200
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from sqlalchemy import text
+
+from app import crud
+from app.database import SessionLocal
+from app.pagination import CursorParams
+
+WORDS = (
+    'кот пёс дом лес река город море солнце дождь снег ветер небо '
+    'книга письмо музыка песня фильм кино театр поезд дорога мост '
+    'утро вечер ночь день весна лето осень зима чай кофе хлеб сыр'
+).split()
+
+SEED_SQL = text(
+    '''
+    INSERT INTO post (text, author_id, pub_date)
+    SELECT (
+        SELECT string_agg(
+            words.w[1 + floor(random() * cardinality(words.w))::int], ' '
+        )
+        -- Referencing g makes the subquery run once per row
+        FROM generate_series(1, 8 + g % 16)
+    ), CAST(:author_id AS integer), now() - g * interval '1 second'
+    FROM generate_series(1, CAST(:count AS integer)) AS g,
+        (SELECT CAST(:words AS text[]) AS w) AS words
+    '''
+)
+
+
+async def seed(count: int) -> None:
+    async with SessionLocal() as db:
+        author_id = await db.scalar(
+            text(
+                'INSERT INTO "user" (username, email, password) '
+                "VALUES ('search-bench', 'search-bench@example.com', '!') "
+                'ON CONFLICT (username) '
+                'DO UPDATE SET username = excluded.username RETURNING id'
+            )
+        )
+        start = time.perf_counter()
+        await db.execute(
+            SEED_SQL, {'words': WORDS, 'author_id': author_id, 'count': count}
+        )
+        await db.commit()
+        await db.execute(text('ANALYZE post'))
+        print(f'seeded {count} posts in {time.perf_counter() - start:.1f}s')
+
+
+async def run(args: argparse.Namespace) -> None:
+    if args.seed:
+        await seed(args.seed)
+    params = CursorParams(size=args.size)
+    latencies: list[float] = []
+    async with SessionLocal() as db:
+        for _ in range(args.requests):
+            query = ' '.join(random.sample(WORDS, args.words))
+            start = time.perf_counter()
+            page = await crud.search_posts(db, query=query, params=params)
+            if page.next:  # Second page, to include cursor decoding
+                await crud.search_posts(
+                    db,
+                    query=query,
+                    params=CursorParams(cursor=page.next, size=args.size),
+                )
+            latencies.append(time.perf_counter() - start)
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f'{args.requests} searches for {args.words} words, 2 pages each, '
+        f'p50/p95/p99: {quantiles[49] * 1000:.1f}/'
+        f'{quantiles[94] * 1000:.1f}/{quantiles[98] * 1000:.1f} ms'
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seed', type=int, default=1_000_000)
+    parser.add_argument('-n', '--requests', type=int, default=200)
+    parser.add_argument('--words', type=int, default=2)
+    parser.add_argument('--size', type=int, default=10)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
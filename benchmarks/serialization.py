@@ -0,0 +1,118 @@
+"""Compare per-row CPU cost of schema and row serialization of list pages.
+
+Runs without a database or server, but needs the app settings (.env):
+
+    python -m benchmarks.serialization -n 100 --pages 200
+"""
+import argparse
+import json
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from app import schemas
+from app.pagination import CursorPage
+from app.serializers import page_response, post_row
+
+PostRow = namedtuple(
+    'PostRow',
+    [
+        'id',
+        'author',
+        'text',
+        'pub_date',
+        'image',
+        'group',
+        'image_variants',
+        'comment_count',
+    ],
+)
+
+
+def make_rows(count: int) -> list[PostRow]:
+    start = datetime(2023, 9, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(count):
+        image = f'{i:064x}.png' if i % 3 == 0 else None
+        rows.append(
+            PostRow(
+                id=i,
+                author=f'user{i % 50}',
+                text=f'Пост номер {i} ' * 10,
+                pub_date=start + timedelta(seconds=i, microseconds=i % 7),
+                image=image,
+                group=i % 5 or None,
+                image_variants=(
+                    {'thumb': f'{i:064x}.thumb.webp'}
+                    if image and i % 2
+                    else None
+                ),
+                comment_count=i % 13,
+            )
+        )
+    return rows
+
+
+def as_orm(row: PostRow) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=row.id,
+        author=SimpleNamespace(username=row.author),
+        text=row.text,
+        pub_date=row.pub_date,
+        image=row.image,
+        group_id=row.group,
+        image_variants=row.image_variants,
+        comment_count=row.comment_count,
+    )
+
+
+def schema_path(adapter: TypeAdapter, page: CursorPage) -> bytes:
+    """What FastAPI does for `response_model=CursorPage[schemas.Post]`."""
+    content = adapter.dump_python(
+        adapter.validate_python(page, from_attributes=True), mode='json'
+    )
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(',', ':')
+    ).encode()
+
+
+def fast_path(page: CursorPage) -> bytes:
+    return page_response(page, post_row, Response()).body
+
+
+def timed(func, pages: int) -> float:
+    start = time.perf_counter()
+    for _ in range(pages):
+        func()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--size', type=int, default=100)
+    parser.add_argument('--pages', type=int, default=200)
+    args = parser.parse_args()
+
+    rows = make_rows(args.size)
+    row_page = CursorPage(items=rows, next='abc')
+    orm_page = CursorPage(items=[as_orm(row) for row in rows], next='abc')
+    adapter = TypeAdapter(CursorPage[schemas.Post])
+
+    if schema_path(adapter, orm_page) != fast_path(row_page):
+        raise SystemExit('Outputs differ')
+
+    total = args.size * args.pages
+    for name, func in (
+        ('schema', lambda: schema_path(adapter, orm_page)),
+        ('rows', lambda: fast_path(row_page)),
+    ):
+        elapsed = timed(func, args.pages)
+        print(f'{name}: {elapsed / total * 1e6:.2f} µs/row')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,9 @@
 # flake8: noqa
+# Start with `python -m asyncio` and `from db_shell import *` to get
+# top-level await, e.g. `await session.scalars(select(Post))`.
 from sqlalchemy import select
 
-from app.database import get_db
+from app.database import SessionLocal
 from app.models import Comment, Follow, Group, Post, User
 
-session = next(get_db())
+session = SessionLocal()
@@ -0,0 +1,103 @@
+"""Initial schema
+
+Databases created by the old `create_all` on startup already match this
+revision: mark them with `alembic stamp 0001` before `alembic upgrade head`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2023-10-01 12:00:00.000000
+"""
+from typing import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = '0001'
+down_revision: str | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=30), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('password', sa.String(), nullable=False),
+        sa.Column(
+            'is_active',
+            sa.Boolean(),
+            server_default=sa.text('true'),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+        sa.UniqueConstraint('username'),
+    )
+    op.create_table(
+        'group',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('slug', sa.String(length=50), nullable=False),
+        sa.Column('description', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('slug'),
+    )
+    op.create_table(
+        'post',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('text', sa.String(), nullable=False),
+        sa.Column(
+            'pub_date',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+        sa.Column('author_id', sa.Integer(), nullable=False),
+        sa.Column('group_id', sa.Integer(), nullable=True),
+        sa.Column('image', sa.String(length=100), nullable=True),
+        sa.ForeignKeyConstraint(
+            ['author_id'], ['user.id'], ondelete='CASCADE'
+        ),
+        sa.ForeignKeyConstraint(
+            ['group_id'], ['group.id'], ondelete='SET NULL'
+        ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'comment',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('author_id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('text', sa.String(), nullable=False),
+        sa.Column(
+            'created',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(
+            ['author_id'], ['user.id'], ondelete='CASCADE'
+        ),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'follow',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('following_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['following_id'], ['user.id'], ondelete='CASCADE'
+        ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'following_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('follow')
+    op.drop_table('comment')
+    op.drop_table('post')
+    op.drop_table('group')
+    op.drop_table('user')
@@ -0,0 +1,55 @@
+"""Indexes for keyset pagination and foreign key lookups
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2023-10-01 12:30:00.000000
+"""
+from typing import Sequence
+
+from alembic import op
+
+revision: str = '0002'
+down_revision: str | None = '0001'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+INDEXES = (
+    ('post_pub_date_id_idx', 'post', ['pub_date', 'id']),
+    (
+        'post_author_id_pub_date_id_idx',
+        'post',
+        ['author_id', 'pub_date', 'id'],
+    ),
+    ('post_group_id_pub_date_id_idx', 'post', ['group_id', 'pub_date', 'id']),
+    (
+        'comment_post_id_created_id_idx',
+        'comment',
+        ['post_id', 'created', 'id'],
+    ),
+    ('comment_author_id_idx', 'comment', ['author_id']),
+    ('follow_following_id_idx', 'follow', ['following_id']),
+)
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the tables writable while the indexes are built
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
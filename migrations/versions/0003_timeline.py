@@ -0,0 +1,66 @@
+"""Precomputed feed timelines
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2023-10-08 12:00:00.000000
+"""
+from typing import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.config import settings
+
+revision: str = '0003'
+down_revision: str | None = '0002'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'user',
+        sa.Column(
+            'fanout_on_read',
+            sa.Boolean(),
+            server_default=sa.text('false'),
+            nullable=False,
+        ),
+    )
+    op.create_table(
+        'timeline',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('pub_date', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'pub_date', 'post_id'),
+    )
+    op.create_index('timeline_post_id_idx', 'timeline', ['post_id'])
+    # The same state that create_follow leaves: authors with too many
+    # followers are merged on read, the others get the latest posts
+    # copied into every follower's timeline
+    op.execute(
+        sa.text(
+            'UPDATE "user" SET fanout_on_read = true WHERE id IN ('
+            'SELECT following_id FROM follow GROUP BY following_id '
+            'HAVING count(*) > :limit)'
+        ).bindparams(limit=settings.feed_fanout_limit)
+    )
+    op.execute(
+        sa.text(
+            'INSERT INTO timeline (user_id, pub_date, post_id) '
+            'SELECT follow.user_id, latest.pub_date, latest.id FROM follow '
+            'JOIN "user" ON "user".id = follow.following_id '
+            'CROSS JOIN LATERAL (SELECT post.id, post.pub_date FROM post '
+            'WHERE post.author_id = follow.following_id '
+            'ORDER BY post.pub_date DESC, post.id DESC LIMIT :size) latest '
+            'WHERE NOT "user".fanout_on_read'
+        ).bindparams(size=settings.feed_backfill_size)
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('timeline_post_id_idx', table_name='timeline')
+    op.drop_table('timeline')
+    op.drop_column('user', 'fanout_on_read')
@@ -0,0 +1,25 @@
+"""Resized image variants of posts
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2023-10-15 12:00:00.000000
+"""
+from typing import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = '0004'
+down_revision: str | None = '0003'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'post', sa.Column('image_variants', sa.JSON(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('post', 'image_variants')
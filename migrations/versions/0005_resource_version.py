@@ -0,0 +1,39 @@
+"""Resource versions for conditional GET
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2023-10-22 12:00:00.000000
+"""
+from typing import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = '0005'
+down_revision: str | None = '0004'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'resource_version',
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column(
+            'version',
+            sa.BigInteger(),
+            server_default=sa.text('1'),
+            nullable=False,
+        ),
+        sa.Column(
+            'modified',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint('key'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('resource_version')
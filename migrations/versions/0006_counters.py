@@ -0,0 +1,47 @@
+"""Denormalized comment, post and follower counters
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2023-10-29 12:00:00.000000
+"""
+from typing import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = '0006'
+down_revision: str | None = '0005'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+COUNTERS = [
+    # table, counter, child table, foreign key
+    ('post', 'comment_count', 'comment', 'post_id'),
+    ('group', 'post_count', 'post', 'group_id'),
+    ('user', 'follower_count', 'follow', 'following_id'),
+    ('user', 'following_count', 'follow', 'user_id'),
+]
+
+
+def upgrade() -> None:
+    for table, counter, child, foreign_key in COUNTERS:
+        op.add_column(
+            table,
+            sa.Column(
+                counter,
+                sa.Integer(),
+                server_default=sa.text('0'),
+                nullable=False,
+            ),
+        )
+        op.execute(
+            f'UPDATE "{table}" SET {counter} = counts.n '
+            f'FROM (SELECT {foreign_key} AS id, count(*) AS n '
+            f'FROM "{child}" GROUP BY {foreign_key}) AS counts '
+            f'WHERE "{table}".id = counts.id'
+        )
+
+
+def downgrade() -> None:
+    for table, counter, _, _ in reversed(COUNTERS):
+        op.drop_column(table, counter)
@@ -0,0 +1,49 @@
+"""Full-text search vector on posts
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2023-11-05 12:00:00.000000
+"""
+from typing import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision: str = '0007'
+down_revision: str | None = '0006'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Adding a stored generated column rewrites the table
+    op.add_column(
+        'post',
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('russian', text)", persisted=True),
+            nullable=False,
+        ),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'post_search_vector_idx',
+            'post',
+            ['search_vector'],
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'post_search_vector_idx',
+            table_name='post',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column('post', 'search_vector')
@@ -0,0 +1,83 @@
+import os
+
+# The suite drops and recreates every table, so it gets its own database
+os.environ['YATUBE_DB_NAME'] = os.environ.get(
+    'YATUBE_TEST_DB_NAME', 'yatube_test'
+)
+os.environ.setdefault('YATUBE_SECRET', 'test')
+os.environ.setdefault('YATUBE_BCRYPT_ROUNDS', '4')
+
+import pytest  # noqa: E402
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from app import database  # noqa: E402
+from app.cache import make_cache_backend, response_cache  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Base, Group, User  # noqa: E402
+from app.oauth2 import user_cache  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.fixture(scope='session')
+async def database_schema(anyio_backend):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    yield
+    await engine.dispose()
+
+
+@pytest.fixture
+async def clean_database(database_schema):
+    yield
+    tables = ', '.join(f'"{name}"' for name in Base.metadata.tables)
+    async with engine.begin() as conn:
+        await conn.execute(text(f'TRUNCATE {tables} RESTART IDENTITY'))
+    # Ids are reused after the truncation, so cached rows must go too
+    user_cache.clear()
+    response_cache.backend = make_cache_backend(None)
+    database.recent_writers = make_cache_backend(None)
+
+
+@pytest.fixture
+async def db(clean_database):
+    async with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+async def client(clean_database):
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url='http://test'
+    ) as client:
+        yield client
+
+
+@pytest.fixture
+def make_user(db):
+    async def make_user(username: str) -> User:
+        user = User(
+            username=username, email=f'{username}@example.com', password='!'
+        )
+        db.add(user)
+        await db.commit()
+        return user
+
+    return make_user
+
+
+@pytest.fixture
+def make_group(db):
+    async def make_group(slug: str) -> Group:
+        group = Group(title=slug.title(), slug=slug, description='')
+        db.add(group)
+        await db.commit()
+        return group
+
+    return make_group
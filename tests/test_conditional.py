@@ -0,0 +1,135 @@
+import pytest
+
+from tests.utils import auth, create_post
+
+pytestmark = pytest.mark.anyio
+
+
+async def etag(client, url: str, **params) -> str:
+    response = await client.get(url, params=params)
+    assert response.status_code == 200, response.text
+    return response.headers['etag']
+
+
+async def test_unchanged_list_is_not_modified(client, make_user):
+    author = await make_user('author')
+    await create_post(client, author)
+    response = await client.get('/api/v1/posts/')
+    tag = response.headers['etag']
+    assert response.headers['cache-control'] == 'no-cache'
+
+    for header in (tag, f'W/"other", {tag}', '*'):
+        response = await client.get(
+            '/api/v1/posts/', headers={'if-none-match': header}
+        )
+        assert response.status_code == 304
+        assert response.content == b''
+        assert response.headers['etag'] == tag
+
+    response = await client.get(
+        '/api/v1/posts/', headers={'if-none-match': 'W/"other"'}
+    )
+    assert response.status_code == 200
+
+
+async def test_any_etag_needs_an_existing_resource(client, make_user):
+    author = await make_user('author')
+    post = await create_post(client, author)
+
+    response = await client.get(
+        f'/api/v1/posts/{post["id"]}', headers={'if-none-match': '*'}
+    )
+    assert response.status_code == 304
+    response = await client.get(
+        '/api/v1/posts/100', headers={'if-none-match': '*'}
+    )
+    assert response.status_code == 404
+
+
+async def test_etag_depends_on_query(client, make_user):
+    author = await make_user('author')
+    await create_post(client, author)
+
+    assert await etag(client, '/api/v1/posts/', size=1) != await etag(
+        client, '/api/v1/posts/', size=2
+    )
+
+
+async def test_writes_change_etags(client, make_user):
+    author = await make_user('author')
+    post = await create_post(client, author)
+    other = await create_post(client, author)
+    post_url = f'/api/v1/posts/{post["id"]}'
+    comments_url = f'{post_url}/comments/'
+    urls = ['/api/v1/posts/', post_url, comments_url]
+    before = {url: await etag(client, url) for url in urls}
+    other_before = await etag(client, f'/api/v1/posts/{other["id"]}')
+
+    # A new comment changes the comment count of the post and its lists
+    response = await client.post(
+        comments_url, json={'text': 'Комментарий'}, headers=auth(author)
+    )
+    comment_id = response.json()['id']
+
+    after = {url: await etag(client, url) for url in urls}
+    assert all(after[url] != before[url] for url in urls)
+    assert await etag(client, f'/api/v1/posts/{other["id"]}') == other_before
+    response = await client.get(
+        post_url, headers={'if-none-match': before[post_url]}
+    )
+    assert response.status_code == 200
+    assert response.json()['comment_count'] == 1
+
+    # Editing a comment leaves the post as it was
+    await client.patch(
+        f'{comments_url}{comment_id}',
+        json={'text': 'Исправлено'},
+        headers=auth(author),
+    )
+    assert await etag(client, post_url) == after[post_url]
+    assert await etag(client, comments_url) != after[comments_url]
+    response = await client.get(comments_url)
+    assert response.json()['items'][0]['text'] == 'Исправлено'
+
+
+async def test_if_modified_since(client, make_user):
+    author = await make_user('author')
+    post = await create_post(client, author)
+    url = f'/api/v1/posts/{post["id"]}'
+    response = await client.get(url)
+    last_modified = response.headers['last-modified']
+
+    response = await client.get(
+        url, headers={'if-modified-since': last_modified}
+    )
+    assert response.status_code == 304
+
+    # If-None-Match takes precedence
+    response = await client.get(
+        url,
+        headers={
+            'if-modified-since': last_modified,
+            'if-none-match': 'W/"other"',
+        },
+    )
+    assert response.status_code == 200
+
+    response = await client.get(
+        url, headers={'if-modified-since': 'Thu, 01 Jan 1970 00:00:00 GMT'}
+    )
+    assert response.status_code == 200
+
+
+async def test_group_changes_made_through_orm(client, db, make_group):
+    group = await make_group('cats')
+    url = f'/api/v1/groups/{group.id}'
+    before = await etag(client, url)
+    groups_before = await etag(client, '/api/v1/groups/')
+
+    group.title = 'Кошки'
+    await db.commit()
+
+    assert await etag(client, url) != before
+    assert await etag(client, '/api/v1/groups/') != groups_before
+    response = await client.get(url)
+    assert response.json()['title'] == 'Кошки'
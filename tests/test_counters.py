@@ -0,0 +1,129 @@
+import asyncio
+from itertools import permutations
+
+import pytest
+from sqlalchemy import select, update
+
+from app import crud, schemas
+from app.counters import reconcile_counters
+from app.database import SessionLocal
+from app.models import Group, Post, User
+from tests.utils import auth
+
+pytestmark = pytest.mark.anyio
+
+
+async def follow(user_id: int, following_id: int) -> None:
+    async with SessionLocal() as db:
+        await crud.create_follow(
+            db, user_id=user_id, following_id=following_id
+        )
+
+
+async def unfollow(user_id: int, following_id: int) -> None:
+    async with SessionLocal() as db:
+        await crud.delete_follow(
+            db, user_id=user_id, following_id=following_id
+        )
+
+
+async def follow_counts(db) -> dict[str, tuple[int, int]]:
+    users = await db.scalars(
+        select(User).execution_options(populate_existing=True)
+    )
+    return {
+        user.username: (user.follower_count, user.following_count)
+        for user in users
+    }
+
+
+async def test_concurrent_mutual_follows_do_not_deadlock(db, make_user):
+    users = [await make_user(f'user{i}') for i in range(4)]
+    pairs = list(permutations([user.id for user in users], 2))
+    for _ in range(5):
+        # Every user follows and then unfollows every other one at once
+        await asyncio.gather(*(follow(*pair) for pair in pairs))
+        assert await follow_counts(db) == {
+            user.username: (3, 3) for user in users
+        }
+        await asyncio.gather(*(unfollow(*pair) for pair in pairs))
+        assert await follow_counts(db) == {
+            user.username: (0, 0) for user in users
+        }
+
+
+async def test_bulk_follow_counts(client, db, make_user):
+    reader = await make_user('reader')
+    for name in ('a', 'b'):
+        await make_user(name)
+    response = await client.post(
+        '/api/v1/follow/bulk/',
+        json=[{'following': 'a'}, {'following': 'b'}, {'following': 'a'}],
+        headers=auth(reader),
+    )
+    assert response.status_code == 200
+    assert await follow_counts(db) == {
+        'reader': (0, 2),
+        'a': (1, 0),
+        'b': (1, 0),
+    }
+
+
+async def test_post_and_comment_counts(client, db, make_user, make_group):
+    author = await make_user('author')
+    group = await make_group('cats')
+    for _ in range(2):
+        response = await client.post(
+            '/api/v1/posts/',
+            json={'text': 'Пост', 'group': group.id},
+            headers=auth(author),
+        )
+        post_id = response.json()['id']
+    for _ in range(3):
+        await client.post(
+            f'/api/v1/posts/{post_id}/comments/',
+            json={'text': 'Комментарий'},
+            headers=auth(author),
+        )
+    await client.delete(
+        f'/api/v1/posts/{post_id}/comments/1', headers=auth(author)
+    )
+
+    response = await client.get(f'/api/v1/posts/{post_id}')
+    assert response.json()['comment_count'] == 2
+    response = await client.get(f'/api/v1/groups/{group.id}')
+    assert response.json()['post_count'] == 2
+
+    await client.delete(f'/api/v1/posts/{post_id}', headers=auth(author))
+    response = await client.get(f'/api/v1/groups/{group.id}')
+    assert response.json()['post_count'] == 1
+
+
+async def test_reconcile_counters_repairs_drift(db, make_user, make_group):
+    author = await make_user('author')
+    group = await make_group('cats')
+    [post] = await crud.create_posts(
+        db,
+        items=[schemas.PostCreate(text='Пост', group=group.id)],
+        author_id=author.id,
+        author_username=author.username,
+    )
+    await db.execute(update(Group).values(post_count=5))
+    await db.execute(update(Post).values(comment_count=-1))
+    await db.commit()
+
+    repaired = await reconcile_counters(db)
+
+    assert repaired == {
+        'Post.comment_count': 1,
+        'Group.post_count': 1,
+        'User.follower_count': 0,
+        'User.following_count': 0,
+    }
+    assert await db.scalar(
+        select(Group.post_count).where(Group.id == group.id)
+    ) == 1
+    assert await db.scalar(
+        select(Post.comment_count).where(Post.id == post.id)
+    ) == 0
+    assert await reconcile_counters(db) == dict.fromkeys(repaired, 0)
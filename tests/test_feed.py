@@ -0,0 +1,108 @@
+import pytest
+from sqlalchemy import select
+
+from app.config import settings
+from app.models import TimelineEntry, User
+from tests.utils import auth, create_post, read_all_pages
+
+pytestmark = pytest.mark.anyio
+
+
+async def follow(client, user: User, following: User) -> None:
+    response = await client.post(
+        '/api/v1/follow/',
+        json={'following': following.username},
+        headers=auth(user),
+    )
+    assert response.status_code == 200, response.text
+
+
+async def read_feed(client, user: User, size: int = 3) -> list[int]:
+    items = await read_all_pages(
+        client, '/api/v1/feed/', size=size, headers=auth(user)
+    )
+    return [item['id'] for item in items]
+
+
+async def test_feed_pushes_new_posts(client, make_user):
+    reader, author = await make_user('reader'), await make_user('author')
+    await follow(client, reader, author)
+    ids = [(await create_post(client, author))['id'] for _ in range(7)]
+
+    assert await read_feed(client, reader) == ids[::-1]
+    assert await read_feed(client, author) == []
+
+
+async def test_follow_backfills_latest_posts(client, make_user, monkeypatch):
+    monkeypatch.setattr(settings, 'feed_backfill_size', 2)
+    reader, author = await make_user('reader'), await make_user('author')
+    ids = [(await create_post(client, author))['id'] for _ in range(3)]
+
+    await follow(client, reader, author)
+
+    assert await read_feed(client, reader) == ids[:0:-1]
+
+
+async def test_unfollow_trims_timeline(client, make_user):
+    reader, author = await make_user('reader'), await make_user('author')
+    await follow(client, reader, author)
+    await create_post(client, author)
+
+    response = await client.delete(
+        f'/api/v1/follow/{author.username}', headers=auth(reader)
+    )
+
+    assert response.status_code == 204
+    assert await read_feed(client, reader) == []
+
+
+async def test_feed_merges_pushed_and_pulled_posts(
+    client, db, make_user, monkeypatch
+):
+    monkeypatch.setattr(settings, 'feed_fanout_limit', 1)
+    reader, other = await make_user('reader'), await make_user('other')
+    small, big = await make_user('small'), await make_user('big')
+    await follow(client, reader, small)
+    await follow(client, other, big)
+    big_ids = [(await create_post(client, big))['id'] for _ in range(2)]
+    # A second follower switches big to merging on read
+    await follow(client, reader, big)
+    ids = big_ids.copy()
+    for i in range(8):
+        ids.append((await create_post(client, (small, big)[i % 2]))['id'])
+
+    assert await db.scalar(
+        select(User.fanout_on_read).where(User.id == big.id)
+    )
+    pushed = await db.scalars(select(TimelineEntry.post_id))
+    assert set(pushed) == set(ids[2::2])
+    for size in (1, 3, 20):
+        assert await read_feed(client, reader, size) == ids[::-1]
+
+
+async def test_feed_pages_backwards(client, make_user):
+    reader, author = await make_user('reader'), await make_user('author')
+    await follow(client, reader, author)
+    for _ in range(5):
+        await create_post(client, author)
+
+    headers = auth(reader)
+    first = (
+        await client.get('/api/v1/feed/?size=2', headers=headers)
+    ).json()
+    second = (
+        await client.get(
+            '/api/v1/feed/',
+            params={'size': 2, 'cursor': first['next']},
+            headers=headers,
+        )
+    ).json()
+    back = (
+        await client.get(
+            '/api/v1/feed/',
+            params={'size': 2, 'cursor': second['previous']},
+            headers=headers,
+        )
+    ).json()
+
+    assert back['items'] == first['items']
@@ -0,0 +1,73 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from app import images
+from app.storage import storage
+from tests.utils import auth
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'root', tmp_path)
+    queue = images.JobQueue(tmp_path / '.queue')
+    monkeypatch.setattr(images.image_processor, 'queue', queue)
+    return queue
+
+
+async def upload_image(client, user) -> str:
+    buffer = BytesIO()
+    Image.new('RGB', (2, 2), 'red').save(buffer, format='PNG')
+    response = await client.post(
+        '/api/v1/images/',
+        content=buffer.getvalue(),
+        headers={'content-type': 'image/png'} | auth(user),
+    )
+    assert response.status_code == 201, response.text
+    return response.json()['image']
+
+
+async def test_bulk_create_queues_a_job_per_image(client, make_user, queue):
+    author = await make_user('author')
+    image = await upload_image(client, author)
+
+    response = await client.post(
+        '/api/v1/posts/bulk/',
+        json=[{'text': 'Пост', 'image': image}] * 3 + [{'text': 'Пост'}],
+        headers=auth(author),
+    )
+    assert response.status_code == 200
+
+    jobs = []
+    while (claimed := queue.claim()) is not None:
+        path, job = claimed
+        jobs.append(job)
+        queue.done(path)
+    assert jobs == [
+        {'post_id': post_id, 'image': image} for post_id in (1, 2, 3)
+    ]
+
+
+async def test_processed_variants_are_saved(client, make_user, queue):
+    author = await make_user('author')
+    image = await upload_image(client, author)
+    response = await client.post(
+        '/api/v1/posts/',
+        json={'text': 'Пост', 'image': image},
+        headers=auth(author),
+    )
+    post_id = response.json()['id']
+    claimed = queue.claim()
+    assert claimed is not None
+    path, job = claimed
+
+    variants = images.make_variants(job['image'])
+    await images.save_variants(job['post_id'], job['image'], variants)
+    queue.done(path)
+
+    response = await client.get(f'/api/v1/posts/{post_id}')
+    assert set(response.json()['image_variants']) == set(images.VARIANTS)
+    assert queue.claim() is None
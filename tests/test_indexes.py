@@ -0,0 +1,160 @@
+"""The hot queries, built by crud exactly as the routers run them, must
+read their pages from the indexes declared for them.
+
+Sequential and bitmap scans are disabled while explaining, so the check
+works on a near-empty database too: it verifies that an index can be
+read in page order for each query, not that the planner prefers it for
+the current data. A bitmap scan returns rows in physical order, so it
+always needs a sort.
+"""
+import json
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator
+
+import pytest
+from sqlalchemy import event
+
+from app import crud, schemas
+from app.database import engine
+from app.pagination import CursorPage, CursorParams
+
+pytestmark = pytest.mark.anyio
+
+PageLoader = Callable[[CursorParams], Awaitable[CursorPage]]
+
+
+@contextmanager
+def captured_statements() -> Iterator[list[tuple[str, Any]]]:
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', capture)
+
+
+async def explain(statement: str, parameters: Any) -> dict:
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        await conn.exec_driver_sql('SET LOCAL enable_bitmapscan = off')
+        result = await conn.exec_driver_sql(
+            f'EXPLAIN (FORMAT JSON) {statement}', parameters
+        )
+        plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+async def second_page_plan(load: PageLoader) -> dict:
+    """Plan of the statement reading a page past a cursor."""
+    first = await load(CursorParams(size=1))
+    assert first.next is not None
+    with captured_statements() as statements:
+        await load(CursorParams(cursor=first.next, size=1))
+    [(statement, parameters)] = statements
+    return await explain(statement, parameters)
+
+
+def index_scans(
+    plan: dict, ancestors: tuple[dict, ...] = ()
+) -> Iterator[tuple[dict, tuple[dict, ...]]]:
+    if 'Index Name' in plan:
+        yield plan, ancestors
+    for child in plan.get('Plans', ()):
+        yield from index_scans(child, (plan, *ancestors))
+
+
+def assert_pages_from_index(plan: dict, index: str) -> None:
+    """`index` is read in page order: a LIMIT stops every scan of it
+    before anything has to sort the rows."""
+    scans = [
+        ancestors
+        for node, ancestors in index_scans(plan)
+        if node['Index Name'] == index
+    ]
+    assert scans, f'{index} is not used:\n{json.dumps(plan, indent=2)}'
+    for ancestors in scans:
+        cut = next(
+            node['Node Type']
+            for node in ancestors
+            if node['Node Type'] in ('Limit', 'Sort')
+        )
+        assert cut == 'Limit', json.dumps(plan, indent=2)
+
+
+@pytest.fixture
+async def data(db, make_user, make_group) -> dict[str, Any]:
+    reader, author = await make_user('reader'), await make_user('author')
+    big = await make_user('big')
+    big.fanout_on_read = True
+    group = await make_group('cats')
+    await db.commit()
+    for user in (author, big):
+        await crud.create_follow(db, user_id=reader.id, following_id=user.id)
+        [row, _] = await crud.create_posts(
+            db,
+            items=[schemas.PostCreate(text='Пост', group=group.id)] * 2,
+            author_id=user.id,
+            author_username=user.username,
+        )
+    post = await crud.get_post(db, post_id=row.id)
+    await crud.create_comments(
+        db,
+        items=[schemas.CommentCreate(text='Комментарий')] * 2,
+        post=post,
+        author_id=reader.id,
+        author_username=reader.username,
+    )
+    return {'reader': reader, 'author': author, 'group': group, 'post': post}
+
+
+HOT_QUERIES: dict[str, tuple[Callable, tuple[str, ...]]] = {
+    'posts': (
+        lambda db, data, params: crud.get_posts(db, params=params),
+        ('post_pub_date_id_idx',),
+    ),
+    'group posts': (
+        lambda db, data, params: crud.get_group_posts(
+            db, group_id=data['group'].id, params=params
+        ),
+        ('post_group_id_pub_date_id_idx',),
+    ),
+    'author posts': (
+        lambda db, data, params: crud.get_author_posts(
+            db, author_id=data['author'].id, params=params
+        ),
+        ('post_author_id_pub_date_id_idx',),
+    ),
+    'comments': (
+        lambda db, data, params: crud.get_comments(
+            db, post=data['post'], params=params
+        ),
+        ('comment_post_id_created_id_idx',),
+    ),
+    'follows': (
+        lambda db, data, params: crud.get_follows(
+            db, user_id=data['reader'].id, params=params
+        ),
+        ('follow_pkey',),
+    ),
+    # Pushed posts from the timeline, pulled ones from their authors
+    'feed': (
+        lambda db, data, params: crud.get_feed(
+            db, user_id=data['reader'].id, params=params
+        ),
+        ('timeline_pkey', 'post_author_id_pub_date_id_idx'),
+    ),
+}
+
+
+@pytest.mark.parametrize('name', HOT_QUERIES)
+async def test_pages_are_read_from_index(db, data, name):
+    load, indexes = HOT_QUERIES[name]
+    plan = await second_page_plan(lambda params: load(db, data, params))
+    for index in indexes:
+        assert_pages_from_index(plan, index)
@@ -0,0 +1,131 @@
+import json
+from pathlib import Path
+
+import pytest
+from sqlalchemy import func, select, text
+
+from app.loader import LoaderError, load
+from app.models import Comment, Post, ResourceVersion, TimelineEntry, User
+from tests.utils import create_post
+
+pytestmark = pytest.mark.anyio
+
+SECONDARY_OBJECTS = text(
+    "SELECT count(*) FROM pg_indexes WHERE schemaname = 'public' "
+    "UNION ALL SELECT count(*) FROM pg_constraint WHERE contype = 'f'"
+)
+
+
+def write_csv(path: Path, lines: list[str]) -> Path:
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return path
+
+
+def write_ndjson(path: Path, records: list[dict]) -> Path:
+    lines = (json.dumps(record, ensure_ascii=False) for record in records)
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def files(tmp_path) -> dict[str, Path]:
+    return {
+        'user': write_csv(
+            tmp_path / 'users.csv',
+            ['id,username,email,password']
+            + [f'{i},user{i},user{i}@example.com,!' for i in (1, 2, 3)],
+        ),
+        'group': write_ndjson(
+            tmp_path / 'groups.ndjson',
+            [{'id': 5, 'title': 'Коты', 'slug': 'cats', 'description': ''}],
+        ),
+        'post': write_csv(
+            tmp_path / 'posts.csv',
+            ['id,text,pub_date,author_id,group_id']
+            + [
+                f'{i},Пост {i},2024-01-0{i}T00:00:00+00:00,1,'
+                + ('5' if i % 2 else '')
+                for i in range(1, 5)
+            ],
+        ),
+        'comment': write_ndjson(
+            tmp_path / 'comments.ndjson',
+            [
+                {
+                    'id': i,
+                    'post_id': 1,
+                    'author_id': 2,
+                    'text': 'Комментарий',
+                    'created': '2024-02-01T00:00:00+00:00',
+                }
+                for i in (1, 2)
+            ],
+        ),
+        'follow': write_csv(
+            tmp_path / 'follows.csv',
+            ['user_id,following_id', '2,1', '3,1'],
+        ),
+    }
+
+
+async def test_load(db, client, files):
+    before = (await db.scalars(SECONDARY_OBJECTS)).all()
+
+    await load(files, defer=True)
+
+    assert (await db.scalars(SECONDARY_OBJECTS)).all() == before
+    assert await db.scalar(select(func.count()).select_from(Post)) == 4
+    author = await db.get(User, 1)
+    assert (author.follower_count, author.following_count) == (2, 0)
+    assert (await db.get(Post, 1)).comment_count == 2
+    timeline = await db.scalars(
+        select(TimelineEntry.post_id).where(TimelineEntry.user_id == 2)
+    )
+    assert sorted(timeline) == [1, 2, 3, 4]
+    keys = await db.scalars(select(ResourceVersion.key))
+    assert {'posts', 'groups', 'post:1', 'comments:4', 'group:5'} <= set(
+        keys
+    )
+
+    # Ids generated after the load follow the loaded ones
+    post = await create_post(client, author)
+    assert post['id'] == 5
+    assert await db.scalar(select(func.max(Comment.id))) == 2
+
+
+async def test_ndjson_keys_must_match_first_record(db, files, tmp_path):
+    files['comment'] = write_ndjson(
+        tmp_path / 'comments.ndjson',
+        [
+            {'post_id': 1, 'author_id': 2, 'text': 'Комментарий'},
+            {'post_id': 1, 'author_id': 2},
+        ],
+    )
+
+    with pytest.raises(LoaderError, match=r'comments\.ndjson:2: '):
+        await load(files, defer=True)
+
+    # The whole load is rolled back
+    assert await db.scalar(select(func.count()).select_from(User)) == 0
+
+
+async def test_invalid_value_is_reported_with_line(db, files, tmp_path):
+    files['follow'] = write_csv(
+        tmp_path / 'follows.csv',
+        ['user_id,following_id', '2,1', '3,one'],
+    )
+
+    with pytest.raises(LoaderError, match=r'follows\.csv:3: '):
+        await load(files, defer=False)
+
+
+@pytest.mark.parametrize('row', ['2,1,3', '2'])
+async def test_csv_rows_must_have_every_column(db, files, tmp_path, row):
+    files['follow'] = write_csv(
+        tmp_path / 'follows.csv', ['user_id,following_id', '3,1', row]
+    )
+
+    with pytest.raises(LoaderError, match=r'follows\.csv:3: expected 2'):
+        await load(files, defer=True)
+
+    assert await db.scalar(select(func.count()).select_from(User)) == 0
@@ -0,0 +1,89 @@
+import pytest
+
+from app.routers.media import MEDIA_NAME_RE
+from app.storage import storage
+
+pytestmark = pytest.mark.anyio
+
+CONTENT = bytes(range(100))
+URL = '/media/image.png'
+
+
+@pytest.fixture(autouse=True)
+def media_root(tmp_path, monkeypatch):
+    root = tmp_path / 'media'
+    root.mkdir()
+    (root / 'image.png').write_bytes(CONTENT)
+    (root / '.queue').write_text('{}')
+    (tmp_path / 'secret.png').write_bytes(b'secret')
+    monkeypatch.setattr(storage, 'root', root)
+    return root
+
+
+async def test_whole_file(client):
+    response = await client.get(URL)
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers['content-type'] == 'image/png'
+    assert response.headers['etag'] == '"image.png"'
+    assert response.headers['accept-ranges'] == 'bytes'
+
+
+@pytest.mark.parametrize(
+    'header, first, last',
+    [
+        ('bytes=10-19', 10, 19),
+        ('bytes=90-', 90, 99),
+        ('bytes=95-200', 95, 99),
+        ('bytes=-5', 95, 99),
+        ('bytes=-500', 0, 99),
+    ],
+)
+async def test_range(client, header, first, last):
+    response = await client.get(URL, headers={'range': header})
+
+    assert response.status_code == 206
+    assert response.content == CONTENT[first:][: last - first + 1]
+    assert response.headers['content-range'] == f'bytes {first}-{last}/100'
+    assert response.headers['content-length'] == str(last - first + 1)
+
+
+@pytest.mark.parametrize('header', ['bytes=100-', 'bytes=20-10', 'bytes=-0'])
+async def test_range_not_satisfiable(client, header):
+    response = await client.get(URL, headers={'range': header})
+
+    assert response.status_code == 416
+    assert response.headers['content-range'] == 'bytes */100'
+
+
+async def test_range_of_another_version_sends_whole_file(client):
+    response = await client.get(
+        URL, headers={'range': 'bytes=0-9', 'if-range': '"other"'}
+    )
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+@pytest.mark.parametrize('header', ['"image.png"', 'W/"other", "image.png"'])
+async def test_not_modified(client, header):
+    response = await client.get(URL, headers={'if-none-match': header})
+
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response.headers['etag'] == '"image.png"'
+
+
+@pytest.mark.parametrize(
+    'name', ['%2E%2E', '.queue', 'missing.png', '%2E%2E%2Fsecret.png']
+)
+async def test_hidden_and_missing_files(client, name):
+    response = await client.get(f'/media/{name}')
+
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize('name', ['../secret.png', '..', '.', '.queue'])
+def test_media_name_rejects_parents_and_dot_files(name):
+    assert MEDIA_NAME_RE.fullmatch(name) is None
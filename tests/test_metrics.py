@@ -0,0 +1,36 @@
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy.exc import ProgrammingError
+
+from app import database
+from app.metrics import instrument_engine
+
+pytestmark = pytest.mark.anyio
+
+
+def statement_count(statement: str) -> float:
+    return (
+        REGISTRY.get_sample_value(
+            'db_statement_duration_seconds_count',
+            {'route': 'background', 'statement': statement},
+        )
+        or 0
+    )
+
+
+async def test_statements_are_timed_after_a_failure(database_schema):
+    engine = database.make_engine(database.DATABASE_URL)
+    instrument_engine(engine)
+    before = statement_count('SELECT 1')
+    try:
+        async with engine.connect() as conn:
+            with pytest.raises(ProgrammingError):
+                await conn.exec_driver_sql('SELECT * FROM missing_table')
+            await conn.rollback()
+            await conn.exec_driver_sql('SELECT 1')
+            await conn.exec_driver_sql('SELECT 1')
+    finally:
+        await engine.dispose()
+
+    assert statement_count('SELECT 1') == before + 2
+    assert statement_count('SELECT * FROM missing_table') == 0
@@ -0,0 +1,170 @@
+import json
+from base64 import urlsafe_b64encode
+
+import pytest
+
+from tests.utils import auth, create_post, read_all_pages
+
+pytestmark = pytest.mark.anyio
+
+
+async def read_pages(client, url: str, *, size: int, **kwargs) -> list[dict]:
+    """Every page, following the `next` cursors."""
+    pages = []
+    params: dict = {'size': size}
+    while True:
+        response = await client.get(url, params=params, **kwargs)
+        assert response.status_code == 200, response.text
+        pages.append(response.json())
+        if pages[-1]['next'] is None:
+            return pages
+        params['cursor'] = pages[-1]['next']
+
+
+async def read_pages_backwards(
+    client, url: str, page: dict, *, size: int, **kwargs
+) -> list[dict]:
+    """Pages before `page`, nearest first, following `previous` cursors."""
+    pages = []
+    while page['previous'] is not None:
+        response = await client.get(
+            url, params={'size': size, 'cursor': page['previous']}, **kwargs
+        )
+        assert response.status_code == 200, response.text
+        page = response.json()
+        pages.append(page)
+    return pages
+
+
+def ids(pages: list[dict], key: str = 'id') -> list[list]:
+    return [[item[key] for item in page['items']] for page in pages]
+
+
+async def test_posts_pages(client, make_user):
+    author = await make_user('author')
+    for _ in range(7):
+        await create_post(client, author)
+
+    pages = await read_pages(client, '/api/v1/posts/', size=3)
+
+    # Newest first
+    assert ids(pages) == [[7, 6, 5], [4, 3, 2], [1]]
+    assert pages[0]['previous'] is None
+    assert all(page['previous'] is not None for page in pages[1:])
+
+    backwards = await read_pages_backwards(
+        client, '/api/v1/posts/', pages[-1], size=3
+    )
+    assert ids(backwards) == [[4, 3, 2], [7, 6, 5]]
+    # A page reached backwards links forwards again
+    assert backwards[-1]['next'] is not None
+
+
+async def test_backward_page_then_forward(client, make_user):
+    author = await make_user('author')
+    for _ in range(5):
+        await create_post(client, author)
+    [first, _, last] = await read_pages(client, '/api/v1/posts/', size=2)
+
+    [middle, start] = await read_pages_backwards(
+        client, '/api/v1/posts/', last, size=2
+    )
+    response = await client.get(
+        '/api/v1/posts/', params={'size': 2, 'cursor': middle['next']}
+    )
+
+    assert response.json()['items'] == last['items']
+    assert start['items'] == first['items']
+
+
+async def test_include_total(client, make_user):
+    author = await make_user('author')
+    for _ in range(3):
+        await create_post(client, author)
+
+    response = await client.get(
+        '/api/v1/posts/', params={'size': 2, 'include_total': True}
+    )
+    assert response.json()['total'] == 3
+    response = await client.get('/api/v1/posts/', params={'size': 2})
+    assert response.json()['total'] is None
+
+
+async def test_comments_pages(client, make_user):
+    author = await make_user('author')
+    post = await create_post(client, author)
+    url = f'/api/v1/posts/{post["id"]}/comments/'
+    for i in range(5):
+        await client.post(
+            url, json={'text': f'Комментарий {i}'}, headers=auth(author)
+        )
+
+    pages = await read_pages(client, url, size=2)
+
+    # Oldest first
+    assert ids(pages) == [[1, 2], [3, 4], [5]]
+    backwards = await read_pages_backwards(client, url, pages[-1], size=2)
+    assert ids(backwards) == [[3, 4], [1, 2]]
+
+
+async def test_follows_pages(client, make_user):
+    reader = await make_user('reader')
+    names = [f'author{i}' for i in range(5)]
+    for name in names:
+        await make_user(name)
+        await client.post(
+            '/api/v1/follow/', json={'following': name}, headers=auth(reader)
+        )
+
+    pages = await read_pages(
+        client, '/api/v1/follow/', size=2, headers=auth(reader)
+    )
+
+    assert ids(pages, 'following') == [names[:2], names[2:4], names[4:]]
+    backwards = await read_pages_backwards(
+        client, '/api/v1/follow/', pages[-1], size=2, headers=auth(reader)
+    )
+    assert ids(backwards, 'following') == [names[2:4], names[:2]]
+
+
+async def test_pages_do_not_shift_on_insert(client, make_user):
+    author = await make_user('author')
+    for _ in range(4):
+        await create_post(client, author)
+    response = await client.get('/api/v1/posts/', params={'size': 2})
+    cursor = response.json()['next']
+
+    await create_post(client, author)
+    response = await client.get(
+        '/api/v1/posts/', params={'size': 2, 'cursor': cursor}
+    )
+
+    assert [post['id'] for post in response.json()['items']] == [2, 1]
+    assert len(await read_all_pages(client, '/api/v1/posts/', size=2)) == 5
+
+
+def encode(data) -> str:
+    return urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+@pytest.mark.parametrize(
+    'cursor',
+    [
+        'garbage',
+        encode({'v': [1]}),
+        encode({'v': ['not a date', 1]}),
+        encode({'values': []}),
+    ],
+)
+async def test_invalid_cursor(client, cursor):
+    response = await client.get('/api/v1/posts/', params={'cursor': cursor})
+
+    assert response.status_code == 400
+    assert 'cursor' in response.json()['detail']
+
+
+@pytest.mark.parametrize('size', [0, 501])
+async def test_size_is_limited(client, size):
+    response = await client.get('/api/v1/posts/', params={'size': size})
+
+    assert response.status_code == 422
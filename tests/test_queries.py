@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import select
+
+from app.query_counter import QueryBudgetExceeded, count_queries
+from tests.utils import auth
+
+pytestmark = pytest.mark.anyio
+
+URLS = [
+    '/api/v1/posts/?size=50',
+    '/api/v1/posts/1',
+    '/api/v1/posts/1/comments/?size=50',
+    '/api/v1/posts/1/comments/1',
+    '/api/v1/follow/?size=50',
+]
+
+
+async def test_count_queries_raises_over_budget(db):
+    with pytest.raises(QueryBudgetExceeded, match='2 queries sent'):
+        with count_queries(budget=1):
+            await db.execute(select(1))
+            await db.execute(select(1))
+
+
+async def test_count_queries_within_budget(db):
+    with count_queries(budget=1) as counter:
+        await db.execute(select(1))
+    assert counter.count == 1
+
+
+async def add_authors(client, reader, make_user, names):
+    for name in names:
+        author = await make_user(name)
+        response = await client.post(
+            '/api/v1/posts/',
+            json={'text': f'Пост {name}'},
+            headers=auth(author),
+        )
+        assert response.status_code == 200
+        response = await client.post(
+            '/api/v1/posts/1/comments/',
+            json={'text': f'Комментарий {name}'},
+            headers=auth(author),
+        )
+        assert response.status_code == 200
+        response = await client.post(
+            '/api/v1/follow/', json={'following': name}, headers=auth(reader)
+        )
+        assert response.status_code == 200
+
+
+async def count_requests(client, reader) -> dict[str, int]:
+    counts = {}
+    for url in URLS:
+        # Warm the user and response caches, which later requests hit
+        response = await client.get(url, headers=auth(reader))
+        assert response.status_code == 200
+        with count_queries() as counter:
+            await client.get(url, headers=auth(reader))
+        counts[url] = counter.count
+    return counts
+
+
+async def test_query_count_does_not_grow_with_rows(client, make_user):
+    reader = await make_user('reader')
+    await add_authors(client, reader, make_user, ['author0'])
+    few = await count_requests(client, reader)
+
+    await add_authors(
+        client, reader, make_user, [f'author{i}' for i in range(1, 20)]
+    )
+    many = await count_requests(client, reader)
+
+    assert many == few
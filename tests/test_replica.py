@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import database
+from app.config import settings
+from app.oauth2 import create_access_token
+from tests.utils import auth, create_post
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def replica(clean_database, monkeypatch):
+    """A second engine on the test database standing in for a replica;
+    yields the statements that requests send through it."""
+    engine = database.make_engine(database.DATABASE_URL)
+    monitor = database.ReplicaMonitor(
+        engine, max_lag=1, interval=0, timeout=5
+    )
+    statements: list[str] = []
+
+    @event.listens_for(engine.sync_engine, 'before_cursor_execute')
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if 'pg_last_wal_replay_lsn' not in statement:
+            statements.append(statement)
+
+    monkeypatch.setattr(database, 'replica_monitor', monitor)
+    monkeypatch.setattr(
+        database,
+        'ReplicaSessionLocal',
+        async_sessionmaker(
+            bind=engine, autoflush=False, expire_on_commit=False
+        ),
+    )
+    yield statements
+    await engine.dispose()
+
+
+async def test_reads_go_to_replica(client, make_user, replica):
+    author = await make_user('author')
+    await create_post(client, author)
+    assert replica == []
+
+    response = await client.get('/api/v1/posts/')
+
+    assert response.status_code == 200
+    assert any('FROM post' in statement for statement in replica)
+
+
+async def test_writer_reads_from_primary(
+    client, make_user, replica, monkeypatch
+):
+    monkeypatch.setattr(settings, 'db_replica_sticky_window', 0.2)
+    author, reader = await make_user('author'), await make_user('reader')
+    await create_post(client, author)
+
+    await client.get('/api/v1/posts/', headers=auth(author))
+    assert replica == []
+    await client.get('/api/v1/posts/', headers=auth(reader))
+    assert replica != []
+
+    replica.clear()
+    await asyncio.sleep(0.3)
+    await client.get('/api/v1/posts/', headers=auth(author))
+    assert replica != []
+
+
+async def test_writer_stays_on_primary_with_new_token(
+    client, make_user, replica
+):
+    author = await make_user('author')
+    await create_post(client, author)
+
+    # A refreshed token differs from the one the write was sent with
+    token = create_access_token(data={'sub': author.username, 'n': 1})
+    await client.get(
+        '/api/v1/posts/', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert replica == []
+
+
+@pytest.mark.parametrize('failure', ['lag', 'unreachable'])
+async def test_reads_fall_back_to_primary(
+    client, make_user, replica, monkeypatch, failure
+):
+    async def read_lag() -> float:
+        if failure == 'unreachable':
+            raise OSError('Connection refused')
+        return 10
+
+    monkeypatch.setattr(database.replica_monitor, '_read_lag', read_lag)
+
+    response = await client.get('/api/v1/posts/')
+
+    assert response.status_code == 200
+    assert replica == []
+    assert not await database.replica_monitor.usable()
+
+
+async def test_cached_bodies_are_loaded_from_primary(
+    client, make_user, replica
+):
+    author = await make_user('author')
+    post = await create_post(client, author)
+
+    response = await client.get(f'/api/v1/posts/{post["id"]}')
+
+    assert response.json()['id'] == post['id']
+    # Only the versions behind the ETag are read from the replica
+    assert replica != []
+    assert not any('FROM post' in statement for statement in replica)
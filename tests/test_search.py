@@ -0,0 +1,85 @@
+import pytest
+
+from app import crud
+from app.search import InvertedIndex, MemorySearch, PostgresSearch
+from tests.utils import auth, create_post, read_all_pages
+
+pytestmark = pytest.mark.anyio
+
+SEARCH_URL = '/api/v1/posts/search'
+
+
+@pytest.fixture(params=[PostgresSearch, MemorySearch])
+def backend(request, monkeypatch):
+    backend = request.param()
+    monkeypatch.setattr(crud, 'search_backend', backend)
+    return backend
+
+
+@pytest.fixture
+async def author(make_user):
+    return await make_user('author')
+
+
+async def test_search_matches_every_word(client, backend, author):
+    cat = await create_post(client, author, text='Рыжий кот спит')
+    both = await create_post(client, author, text='Кот и собака дружат')
+    await create_post(client, author, text='Собака лает')
+
+    response = await client.get(SEARCH_URL, params={'q': 'кот'})
+    assert response.status_code == 200
+    assert {post['id'] for post in response.json()['items']} == {
+        cat['id'],
+        both['id'],
+    }
+
+    response = await client.get(SEARCH_URL, params={'q': 'кот собака'})
+    assert [post['id'] for post in response.json()['items']] == [both['id']]
+
+    response = await client.get(SEARCH_URL, params={'q': 'попугай'})
+    assert response.json()['items'] == []
+
+
+async def test_search_pages(client, backend, author):
+    posts = [
+        await create_post(client, author, text=' '.join(['кот'] * (i + 1)))
+        for i in range(5)
+    ]
+    await create_post(client, author, text='Собака')
+
+    response = await client.get(
+        SEARCH_URL, params={'q': 'кот', 'size': 2, 'include_total': True}
+    )
+    assert response.json()['total'] == 5
+
+    found = await read_all_pages(
+        client, SEARCH_URL, size=2, params={'q': 'кот'}
+    )
+    assert sorted(post['id'] for post in found) == [
+        post['id'] for post in posts
+    ]
+
+
+async def test_search_sees_writes(client, backend, author):
+    post = await create_post(client, author, text='Кот')
+    response = await client.get(SEARCH_URL, params={'q': 'кот'})
+    assert len(response.json()['items']) == 1
+
+    await client.delete(f'/api/v1/posts/{post["id"]}', headers=auth(author))
+
+    response = await client.get(SEARCH_URL, params={'q': 'кот'})
+    assert response.json()['items'] == []
+
+
+def test_inverted_index_ranks_by_frequency():
+    index = InvertedIndex()
+    index.add(1, 'кот')
+    index.add(2, 'кот кот собака')
+    index.add(3, 'собака')
+    assert [post_id for _, post_id in index.search('Кот')] == [2, 1]
+    assert [post_id for _, post_id in index.search('кот собака')] == [2]
+
+    index.add(2, 'попугай')
+    assert [post_id for _, post_id in index.search('кот')] == [1]
+    index.remove(1)
+    assert index.search('кот') == []
@@ -0,0 +1,102 @@
+from base64 import b64encode
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from app.storage import InvalidFileType, save_data_uri, storage
+from tests.utils import auth
+
+pytestmark = pytest.mark.anyio
+
+
+def image_bytes(img_format: str) -> bytes:
+    buffer = BytesIO()
+    Image.new('RGB', (2, 2), 'red').save(buffer, format=img_format)
+    return buffer.getvalue()
+
+
+def data_uri(media_type: str, data: bytes) -> str:
+    return f'data:{media_type};base64,{b64encode(data).decode()}'
+
+
+@pytest.fixture(autouse=True)
+def media_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'root', tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize(
+    'media_type, img_format, ext',
+    [
+        ('image/jpeg', 'JPEG', 'jpeg'),
+        ('image/jpg', 'JPEG', 'jpeg'),
+        ('image/png', 'PNG', 'png'),
+        ('image/gif', 'GIF', 'gif'),
+        ('image/webp', 'WEBP', 'webp'),
+    ],
+)
+async def test_save_data_uri(media_root, media_type, img_format, ext):
+    data = image_bytes(img_format)
+
+    name = await save_data_uri(data_uri(media_type, data))
+
+    assert name.endswith(f'.{ext}')
+    assert (media_root / name).read_bytes() == data
+
+
+async def test_data_uri_extension_comes_from_content(media_root):
+    name = await save_data_uri(data_uri('image/gif', image_bytes('PNG')))
+
+    assert name.endswith('.png')
+
+
+@pytest.mark.parametrize(
+    'uri',
+    [
+        data_uri('image/svg+xml', b'<svg><script></script></svg>'),
+        data_uri('image/png', b'<html><script></script></html>'),
+        data_uri('image/png', b'BM' + bytes(64)),  # BMP isn't accepted
+    ],
+)
+async def test_data_uri_must_be_accepted_image(media_root, uri):
+    with pytest.raises(InvalidFileType):
+        await save_data_uri(uri)
+
+    assert list(media_root.iterdir()) == []
+
+
+async def test_upload(client, make_user, media_root):
+    user = await make_user('author')
+    data = image_bytes('JPEG')
+
+    response = await client.post(
+        '/api/v1/images/',
+        content=data,
+        headers={'content-type': 'image/jpg'} | auth(user),
+    )
+
+    assert response.status_code == 201, response.text
+    assert (media_root / response.json()['image']).read_bytes() == data
+
+
+@pytest.mark.parametrize(
+    'content_type, data',
+    [
+        ('text/html', b'<html></html>'),
+        ('image/png', b'<html><script></script></html>'),
+    ],
+)
+async def test_upload_rejects_other_types(
+    client, make_user, media_root, content_type, data
+):
+    user = await make_user('author')
+
+    response = await client.post(
+        '/api/v1/images/',
+        content=data,
+        headers={'content-type': content_type} | auth(user),
+    )
+
+    assert response.status_code == 400
+    assert list(media_root.iterdir()) == []
@@ -0,0 +1,21 @@
+import pytest
+
+from tests.utils import auth
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_cached_user_is_evicted_on_commit(client, db, make_user):
+    user = await make_user('author')
+    response = await client.get('/api/v1/follow/', headers=auth(user))
+    assert response.status_code == 200
+
+    user.is_active = False
+    await db.flush()
+    # A request between the flush and the commit still sees the old row
+    response = await client.get('/api/v1/follow/', headers=auth(user))
+    assert response.status_code == 200
+    await db.commit()
+
+    response = await client.get('/api/v1/follow/', headers=auth(user))
+    assert response.status_code == 400
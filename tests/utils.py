@@ -0,0 +1,38 @@
+from httpx import AsyncClient
+
+from app.models import User
+from app.oauth2 import create_access_token
+
+
+def auth(user: User) -> dict[str, str]:
+    token = create_access_token(data={'sub': user.username})
+    return {'Authorization': f'Bearer {token}'}
+
+
+async def create_post(client: AsyncClient, user: User, **data) -> dict:
+    response = await client.post(
+        '/api/v1/posts/', json={'text': 'Пост'} | data, headers=auth(user)
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def read_all_pages(
+    client: AsyncClient,
+    url: str,
+    *,
+    size: int,
+    params: dict | None = None,
+    **kwargs,
+) -> list[dict]:
+    """Items of every page, following the `next` cursors."""
+    items: list[dict] = []
+    params = {'size': size} | (params or {})
+    while True:
+        response = await client.get(url, params=params, **kwargs)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        items += page['items']
+        if page['next'] is None:
+            return items
+        params['cursor'] = page['next']